@@ -0,0 +1,16 @@
+-- Migration: Add check_nlp_outputs_exist RPC
+-- Date: 2026-10-16
+-- Purpose: Check summary and entities existence for a segment in one round trip
+
+CREATE OR REPLACE FUNCTION check_nlp_outputs_exist(p_segment_id UUID)
+RETURNS TABLE (
+    summary_exists BOOLEAN,
+    entities_exists BOOLEAN
+)
+LANGUAGE sql
+STABLE
+AS $$
+    SELECT
+        EXISTS (SELECT 1 FROM segment_summaries WHERE segment_id = p_segment_id),
+        EXISTS (SELECT 1 FROM segment_entities WHERE segment_id = p_segment_id);
+$$;
@@ -0,0 +1,28 @@
+-- Migration: Add claim_pipeline_jobs RPC
+-- Date: 2026-10-16
+-- Purpose: Atomically claim up to N queued jobs per poll (FOR UPDATE SKIP LOCKED
+--          inside the same statement that marks them running)
+
+CREATE OR REPLACE FUNCTION claim_pipeline_jobs(
+    p_job_type TEXT DEFAULT 'summarize',
+    p_task TEXT DEFAULT 'nlp_pack_v1',
+    p_batch_size INTEGER DEFAULT 1
+)
+RETURNS SETOF pipeline_jobs
+LANGUAGE sql
+AS $$
+    UPDATE pipeline_jobs
+    SET status = 'running',
+        started_at = NOW()
+    WHERE id IN (
+        SELECT id
+        FROM pipeline_jobs
+        WHERE status = 'queued'
+          AND job_type = p_job_type
+          AND input->>'task' = p_task
+        ORDER BY created_at ASC
+        LIMIT p_batch_size
+        FOR UPDATE SKIP LOCKED
+    )
+    RETURNING *;
+$$;
@@ -0,0 +1,35 @@
+-- Migration: Add complete_pipeline_jobs RPC
+-- Date: 2026-10-16
+-- Purpose: Record a batch of job completions (success and failure) in one call so
+--          worker threads finishing close together share a single round trip
+
+CREATE OR REPLACE FUNCTION complete_pipeline_jobs(p_jobs JSONB)
+RETURNS INTEGER
+LANGUAGE plpgsql
+AS $$
+DECLARE
+    v_succeeded INTEGER;
+    v_failed INTEGER;
+BEGIN
+    -- Each element: {"id", "finished_at", "output"} for success, {"id", "finished_at", "error"} for failure
+    UPDATE pipeline_jobs j
+    SET status = 'success',
+        finished_at = c.finished_at,
+        output = c.output
+    FROM jsonb_to_recordset(p_jobs) AS c(id UUID, finished_at TIMESTAMPTZ, output JSONB, error TEXT)
+    WHERE j.id = c.id
+      AND c.error IS NULL;
+    GET DIAGNOSTICS v_succeeded = ROW_COUNT;
+
+    UPDATE pipeline_jobs j
+    SET status = 'failed',
+        finished_at = c.finished_at,
+        error = c.error
+    FROM jsonb_to_recordset(p_jobs) AS c(id UUID, finished_at TIMESTAMPTZ, output JSONB, error TEXT)
+    WHERE j.id = c.id
+      AND c.error IS NOT NULL;
+    GET DIAGNOSTICS v_failed = ROW_COUNT;
+
+    RETURN v_succeeded + v_failed;
+END;
+$$;
@@ -0,0 +1,61 @@
+-- Migration: Add enqueue_missing_nlp_jobs RPC
+-- Date: 2026-10-16
+-- Purpose: Find segments missing NLP outputs, skip ones with pending jobs and insert
+--          the new summarize jobs in a single transaction
+-- Requires: segments_missing_nlp view (2026-10-16_add_segments_missing_nlp_view.sql)
+
+CREATE OR REPLACE FUNCTION enqueue_missing_nlp_jobs(
+    p_force BOOLEAN DEFAULT FALSE,
+    p_limit INTEGER DEFAULT NULL,
+    p_work_id UUID DEFAULT NULL,
+    p_media_type TEXT DEFAULT NULL
+)
+RETURNS TABLE (
+    enqueued INTEGER,
+    skipped_pending INTEGER,
+    skipped_complete INTEGER
+)
+LANGUAGE plpgsql
+AS $$
+BEGIN
+    -- Serialize concurrent enqueuers so the same segment can't be enqueued twice
+    PERFORM pg_advisory_xact_lock(hashtext('enqueue_missing_nlp_jobs'));
+
+    RETURN QUERY
+    WITH missing AS (
+        SELECT
+            m.segment_id,
+            m.edition_id,
+            m.work_id,
+            EXISTS (
+                SELECT 1
+                FROM pipeline_jobs pj
+                WHERE pj.segment_id = m.segment_id
+                  AND pj.job_type = 'summarize'
+                  AND pj.status IN ('queued', 'running')
+            ) AS is_pending
+        FROM segments_missing_nlp m
+        WHERE (p_work_id IS NULL OR m.work_id = p_work_id)
+          AND (p_media_type IS NULL OR m.media_type = p_media_type)
+        ORDER BY m.work_id, m.number
+        LIMIT p_limit
+    ),
+    ins AS (
+        INSERT INTO pipeline_jobs (job_type, segment_id, edition_id, work_id, input, status)
+        SELECT
+            'summarize',
+            segment_id,
+            edition_id,
+            work_id,
+            jsonb_build_object('task', 'nlp_pack_v1', 'force', p_force),
+            'queued'
+        FROM missing
+        WHERE NOT is_pending
+        RETURNING 1
+    )
+    SELECT
+        (SELECT COUNT(*) FROM ins)::INTEGER,
+        (SELECT COUNT(*) FROM missing WHERE is_pending)::INTEGER,
+        0;
+END;
+$$;
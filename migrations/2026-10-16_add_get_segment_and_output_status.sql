@@ -0,0 +1,36 @@
+-- Migration: Add get_segment_and_output_status RPC
+-- Date: 2026-10-16
+-- Purpose: Fetch a job's segment, edition info and output existence flags in one
+--          round trip so already-processed jobs are skipped with a single call
+
+CREATE OR REPLACE FUNCTION get_segment_and_output_status(p_segment_id UUID)
+RETURNS TABLE (
+    segment_id UUID,
+    edition_id UUID,
+    segment_type TEXT,
+    number NUMERIC,
+    title TEXT,
+    media_type TEXT,
+    work_id UUID,
+    summary_exists BOOLEAN,
+    entities_exists BOOLEAN
+)
+LANGUAGE sql
+STABLE
+AS $$
+    SELECT
+        s.id,
+        s.edition_id,
+        s.segment_type,
+        s.number,
+        s.title,
+        e.media_type,
+        e.work_id,
+        ss.segment_id IS NOT NULL,
+        se.segment_id IS NOT NULL
+    FROM segments s
+    JOIN editions e ON e.id = s.edition_id
+    LEFT JOIN segment_summaries ss ON ss.segment_id = s.id
+    LEFT JOIN segment_entities se ON se.segment_id = s.id
+    WHERE s.id = p_segment_id;
+$$;
@@ -0,0 +1,58 @@
+-- Migration: Add get_segments_missing_nlp_outputs RPC
+-- Date: 2026-10-16
+-- Purpose: Find segments missing NLP outputs server-side so the enqueuer only
+--          receives rows that need work instead of filtering in Python
+
+CREATE OR REPLACE FUNCTION get_segments_missing_nlp_outputs(
+    p_work_id UUID DEFAULT NULL,
+    p_edition_id UUID DEFAULT NULL,
+    p_media_type TEXT DEFAULT NULL,
+    p_limit INTEGER DEFAULT NULL
+)
+RETURNS TABLE (
+    segment_id UUID,
+    segment_type TEXT,
+    number NUMERIC,
+    title TEXT,
+    media_type TEXT,
+    work_id UUID,
+    edition_id UUID,
+    has_summary BOOLEAN,
+    has_entities BOOLEAN
+)
+LANGUAGE sql
+STABLE
+AS $$
+    SELECT
+        s.id,
+        s.segment_type,
+        s.number,
+        s.title,
+        e.media_type,
+        e.work_id,
+        e.id,
+        ss.segment_id IS NOT NULL,
+        se.segment_id IS NOT NULL
+    FROM segments s
+    JOIN editions e ON e.id = s.edition_id
+    LEFT JOIN segment_summaries ss ON ss.segment_id = s.id
+    LEFT JOIN segment_entities se ON se.segment_id = s.id
+    WHERE (ss.segment_id IS NULL OR se.segment_id IS NULL)
+      AND (p_work_id IS NULL OR e.work_id = p_work_id)
+      AND (p_edition_id IS NULL OR e.id = p_edition_id)
+      AND (p_media_type IS NULL OR e.media_type = p_media_type)
+      -- Only segments that have the raw asset their media type is processed from
+      AND EXISTS (
+          SELECT 1
+          FROM segment_assets sa
+          JOIN assets a ON a.id = sa.asset_id
+          WHERE sa.segment_id = s.id
+            AND a.asset_type = ANY (CASE e.media_type
+                WHEN 'novel' THEN ARRAY['raw_html', 'cleaned_text']
+                WHEN 'manhwa' THEN ARRAY['raw_image']
+                WHEN 'anime' THEN ARRAY['raw_subtitle']
+            END)
+      )
+    ORDER BY e.work_id, s.number
+    LIMIT p_limit;
+$$;
@@ -0,0 +1,16 @@
+-- Migration: Add pending_segment_ids RPC
+-- Date: 2026-10-16
+-- Purpose: Return which segments already have a queued/running summarize job in one
+--          call, passing ids as a JSON array body instead of chunked IN (...) URLs
+
+CREATE OR REPLACE FUNCTION pending_segment_ids(ids UUID[])
+RETURNS SETOF UUID
+LANGUAGE sql
+STABLE
+AS $$
+    SELECT DISTINCT segment_id
+    FROM pipeline_jobs
+    WHERE segment_id = ANY (ids)
+      AND job_type = 'summarize'
+      AND status IN ('queued', 'running');
+$$;
@@ -0,0 +1,84 @@
+-- Migration: One active job per segment and job type
+-- Date: 2026-10-16
+-- Purpose: Enforce at most one queued/running job per (segment_id, job_type) so
+--          enqueueing can rely on ON CONFLICT DO NOTHING instead of a pending check
+-- Requires: enqueue_missing_nlp_jobs (2026-10-16_add_enqueue_missing_nlp_jobs.sql)
+
+-- ============================================
+-- 1. Fail existing duplicate active jobs
+-- ============================================
+-- Keep a running job if there is one, otherwise the oldest queued job
+
+WITH ranked AS (
+    SELECT
+        id,
+        ROW_NUMBER() OVER (
+            PARTITION BY segment_id, job_type
+            ORDER BY (status = 'running') DESC, created_at
+        ) AS rn
+    FROM pipeline_jobs
+    WHERE segment_id IS NOT NULL
+      AND status IN ('queued', 'running')
+)
+UPDATE pipeline_jobs pj
+SET status = 'failed',
+    finished_at = NOW(),
+    error = 'Duplicate active job removed by migration'
+FROM ranked
+WHERE pj.id = ranked.id
+  AND ranked.rn > 1;
+
+-- ============================================
+-- 2. Partial unique index
+-- ============================================
+
+CREATE UNIQUE INDEX IF NOT EXISTS pipeline_jobs_active_per_segment
+ON pipeline_jobs(segment_id, job_type)
+WHERE status IN ('queued', 'running');
+
+-- ============================================
+-- 3. Enqueue RPC without the separate pending check
+-- ============================================
+
+CREATE OR REPLACE FUNCTION enqueue_missing_nlp_jobs(
+    p_force BOOLEAN DEFAULT FALSE,
+    p_limit INTEGER DEFAULT NULL,
+    p_work_id UUID DEFAULT NULL,
+    p_media_type TEXT DEFAULT NULL
+)
+RETURNS TABLE (
+    enqueued INTEGER,
+    skipped_pending INTEGER,
+    skipped_complete INTEGER
+)
+LANGUAGE plpgsql
+AS $$
+BEGIN
+    RETURN QUERY
+    WITH missing AS (
+        SELECT m.segment_id, m.edition_id, m.work_id
+        FROM segments_missing_nlp m
+        WHERE (p_work_id IS NULL OR m.work_id = p_work_id)
+          AND (p_media_type IS NULL OR m.media_type = p_media_type)
+        ORDER BY m.work_id, m.number
+        LIMIT p_limit
+    ),
+    ins AS (
+        INSERT INTO pipeline_jobs (job_type, segment_id, edition_id, work_id, input, status)
+        SELECT
+            'summarize',
+            segment_id,
+            edition_id,
+            work_id,
+            jsonb_build_object('task', 'nlp_pack_v1', 'force', p_force),
+            'queued'
+        FROM missing
+        ON CONFLICT (segment_id, job_type) WHERE status IN ('queued', 'running') DO NOTHING
+        RETURNING segment_id
+    )
+    SELECT
+        (SELECT COUNT(*) FROM ins)::INTEGER,
+        ((SELECT COUNT(*) FROM missing) - (SELECT COUNT(*) FROM ins))::INTEGER,
+        0;
+END;
+$$;
@@ -0,0 +1,28 @@
+-- Migration: Notify workers when summarize jobs are queued
+-- Date: 2026-10-16
+-- Purpose: Let workers LISTEN on pipeline_jobs_new and wake immediately instead of
+--          polling pipeline_jobs on a fixed interval
+
+CREATE OR REPLACE FUNCTION notify_pipeline_jobs_new()
+RETURNS TRIGGER
+LANGUAGE plpgsql
+AS $$
+BEGIN
+    PERFORM pg_notify('pipeline_jobs_new', '');
+    RETURN NULL;
+END;
+$$;
+
+-- Statement-level so a bulk enqueue sends one notification, not one per row
+DROP TRIGGER IF EXISTS pipeline_jobs_notify_insert ON pipeline_jobs;
+CREATE TRIGGER pipeline_jobs_notify_insert
+AFTER INSERT ON pipeline_jobs
+FOR EACH STATEMENT
+EXECUTE FUNCTION notify_pipeline_jobs_new();
+
+-- Stale jobs reset back to queued should wake workers too
+DROP TRIGGER IF EXISTS pipeline_jobs_notify_requeue ON pipeline_jobs;
+CREATE TRIGGER pipeline_jobs_notify_requeue
+AFTER UPDATE OF status ON pipeline_jobs
+FOR EACH STATEMENT
+EXECUTE FUNCTION notify_pipeline_jobs_new();
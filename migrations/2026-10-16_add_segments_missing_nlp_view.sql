@@ -0,0 +1,50 @@
+-- Migration: Add segments_missing_nlp view and supporting indexes
+-- Date: 2026-10-16
+-- Purpose: Expose the "segments missing NLP outputs" anti-join as a plain view so the
+--          enqueuer can read it through PostgREST with simple filters
+
+-- ============================================
+-- 1. Supporting indexes
+-- ============================================
+-- segment_summaries.segment_id and segment_entities.segment_id are already unique
+-- (upsert targets), so the anti-joins are index lookups. Postgres partial indexes
+-- cannot contain NOT EXISTS subqueries, so ordering is covered by a plain composite.
+
+CREATE INDEX IF NOT EXISTS idx_segments_edition_id_number
+ON segments(edition_id, number);
+
+CREATE INDEX IF NOT EXISTS idx_segment_assets_segment_id
+ON segment_assets(segment_id);
+
+-- ============================================
+-- 2. View
+-- ============================================
+
+CREATE OR REPLACE VIEW segments_missing_nlp AS
+SELECT
+    s.id AS segment_id,
+    s.segment_type,
+    s.number,
+    s.title,
+    e.media_type,
+    e.work_id,
+    e.id AS edition_id,
+    ss.segment_id IS NOT NULL AS has_summary,
+    se.segment_id IS NOT NULL AS has_entities
+FROM segments s
+JOIN editions e ON e.id = s.edition_id
+LEFT JOIN segment_summaries ss ON ss.segment_id = s.id
+LEFT JOIN segment_entities se ON se.segment_id = s.id
+WHERE (ss.segment_id IS NULL OR se.segment_id IS NULL)
+  -- Only segments that have the raw asset their media type is processed from
+  AND EXISTS (
+      SELECT 1
+      FROM segment_assets sa
+      JOIN assets a ON a.id = sa.asset_id
+      WHERE sa.segment_id = s.id
+        AND a.asset_type = ANY (CASE e.media_type
+            WHEN 'novel' THEN ARRAY['raw_html', 'cleaned_text']
+            WHEN 'manhwa' THEN ARRAY['raw_image']
+            WHEN 'anime' THEN ARRAY['raw_subtitle']
+        END)
+  );
@@ -0,0 +1,56 @@
+-- Migration: Add upsert_segment_nlp_outputs RPC
+-- Date: 2026-10-16
+-- Purpose: Write a segment's summary and entities in one call and one transaction,
+--          instead of two separate PostgREST upserts
+-- Requires: events, characters, locations, keywords stored as JSONB
+
+CREATE OR REPLACE FUNCTION upsert_segment_nlp_outputs(
+    p_segment_id UUID,
+    p_edition_id UUID,
+    p_model_version TEXT,
+    p_summary JSONB DEFAULT NULL,   -- {summary, summary_short, events}; NULL leaves the row untouched
+    p_entities JSONB DEFAULT NULL   -- {characters, locations, keywords, time_context}; NULL leaves the row untouched
+)
+RETURNS VOID
+LANGUAGE plpgsql
+AS $$
+BEGIN
+    IF p_summary IS NOT NULL THEN
+        INSERT INTO segment_summaries (segment_id, edition_id, summary, summary_short, events, model_version)
+        VALUES (
+            p_segment_id,
+            p_edition_id,
+            COALESCE(p_summary->>'summary', ''),
+            COALESCE(p_summary->>'summary_short', ''),
+            COALESCE(p_summary->'events', '[]'::jsonb),
+            p_model_version
+        )
+        ON CONFLICT (segment_id) DO UPDATE
+        SET edition_id = EXCLUDED.edition_id,
+            summary = EXCLUDED.summary,
+            summary_short = EXCLUDED.summary_short,
+            events = EXCLUDED.events,
+            model_version = EXCLUDED.model_version;
+    END IF;
+
+    IF p_entities IS NOT NULL THEN
+        INSERT INTO segment_entities (segment_id, edition_id, characters, locations, keywords, time_context, model_version)
+        VALUES (
+            p_segment_id,
+            p_edition_id,
+            COALESCE(p_entities->'characters', '[]'::jsonb),
+            COALESCE(p_entities->'locations', '[]'::jsonb),
+            COALESCE(p_entities->'keywords', '[]'::jsonb),
+            COALESCE(p_entities->>'time_context', 'unknown'),
+            p_model_version
+        )
+        ON CONFLICT (segment_id) DO UPDATE
+        SET edition_id = EXCLUDED.edition_id,
+            characters = EXCLUDED.characters,
+            locations = EXCLUDED.locations,
+            keywords = EXCLUDED.keywords,
+            time_context = EXCLUDED.time_context,
+            model_version = EXCLUDED.model_version;
+    END IF;
+END;
+$$;
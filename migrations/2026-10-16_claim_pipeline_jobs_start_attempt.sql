@@ -0,0 +1,30 @@
+-- Migration: Start the attempt when claiming pipeline jobs
+-- Date: 2026-10-16
+-- Purpose: Increment attempt in claim_pipeline_jobs so the worker no longer needs a
+--          separate set_job_running write after polling
+-- Requires: claim_pipeline_jobs (2026-10-16_add_claim_pipeline_jobs.sql)
+
+CREATE OR REPLACE FUNCTION claim_pipeline_jobs(
+    p_job_type TEXT DEFAULT 'summarize',
+    p_task TEXT DEFAULT 'nlp_pack_v1',
+    p_batch_size INTEGER DEFAULT 1
+)
+RETURNS SETOF pipeline_jobs
+LANGUAGE sql
+AS $$
+    UPDATE pipeline_jobs
+    SET status = 'running',
+        started_at = NOW(),
+        attempt = COALESCE(attempt, 0) + 1
+    WHERE id IN (
+        SELECT id
+        FROM pipeline_jobs
+        WHERE status = 'queued'
+          AND job_type = p_job_type
+          AND input->>'task' = p_task
+        ORDER BY created_at ASC
+        LIMIT p_batch_size
+        FOR UPDATE SKIP LOCKED
+    )
+    RETURNING *;
+$$;
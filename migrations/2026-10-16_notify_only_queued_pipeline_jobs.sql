@@ -0,0 +1,38 @@
+-- Migration: Notify workers only when summarize jobs become queued
+-- Date: 2026-10-16
+-- Purpose: The pipeline_jobs_new triggers fired on every status change, including
+--          the worker's own claims and completions, so each wake-up sent idle
+--          workers polling an empty queue. Filter on the changed rows instead.
+-- Requires: 2026-10-16_add_pipeline_jobs_notify.sql
+
+CREATE OR REPLACE FUNCTION notify_pipeline_jobs_new()
+RETURNS TRIGGER
+LANGUAGE plpgsql
+AS $$
+BEGIN
+    IF EXISTS (
+        SELECT 1 FROM new_rows
+        WHERE status = 'queued' AND job_type = 'summarize'
+    ) THEN
+        PERFORM pg_notify('pipeline_jobs_new', '');
+    END IF;
+    RETURN NULL;
+END;
+$$;
+
+-- Still statement-level: a bulk enqueue sends one notification, not one per row
+DROP TRIGGER IF EXISTS pipeline_jobs_notify_insert ON pipeline_jobs;
+CREATE TRIGGER pipeline_jobs_notify_insert
+AFTER INSERT ON pipeline_jobs
+REFERENCING NEW TABLE AS new_rows
+FOR EACH STATEMENT
+EXECUTE FUNCTION notify_pipeline_jobs_new();
+
+-- Transition tables can't be combined with a column list, so this fires on any
+-- UPDATE and the function checks for rows reset back to queued
+DROP TRIGGER IF EXISTS pipeline_jobs_notify_requeue ON pipeline_jobs;
+CREATE TRIGGER pipeline_jobs_notify_requeue
+AFTER UPDATE ON pipeline_jobs
+REFERENCING NEW TABLE AS new_rows
+FOR EACH STATEMENT
+EXECUTE FUNCTION notify_pipeline_jobs_new();
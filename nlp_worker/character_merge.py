@@ -1,21 +1,56 @@
 """Character merge logic for novel segments with profile-based descriptions."""
 
 import re
+import sys
+import hashlib
+import threading
 import unicodedata
-from typing import List, Dict, Any, Optional, Set
+from collections import OrderedDict
+from functools import lru_cache
+from typing import List, Dict, Any, Optional, Set, Tuple
 from .utils import get_logger
 
 logger = get_logger(__name__)
 
+# Use ICU's NFKC normalizer when PyICU is installed; fall back to the stdlib
+try:
+    from icu import Normalizer2
+    _nfkc = Normalizer2.getNFKCInstance().normalize
+except ImportError:
+    def _nfkc(text: str) -> str:
+        return unicodedata.normalize('NFKC', text)
+
+WHITESPACE_REGEX = re.compile(r'\s+')
+PUNCTUATION_REGEX = re.compile(r'[^\w\s\'-]')
+QUOTE_REGEX = re.compile(r"['\"]")
+
+CHAR_DIGEST_CACHE_MAX = 10000  # Character ids whose last written update digest is remembered
+
+# character id -> digest of the last update written for it by this process
+_recent_char_digests: OrderedDict = OrderedDict()
+_recent_char_digests_lock = threading.Lock()
+
+# ASCII equivalent of PUNCTUATION_REGEX for str.translate
+ASCII_PUNCTUATION_TABLE = str.maketrans('', '', ''.join(
+    c for c in map(chr, range(128))
+    if not (c.isalnum() or c.isspace() or c in "_'-")
+))
+
 
 def normalize_text(text: str) -> str:
     """Normalize text for comparison: lowercase, strip, normalize unicode, remove extra spaces."""
     if not text:
         return ""
-    text = unicodedata.normalize('NFKC', text)
+    if text.isascii():
+        # Single ASCII words (most names) have nothing to normalize beyond case
+        if text.isalnum():
+            return text.lower()
+        # NFKC is a no-op on ASCII; split/join + translate replace the regex passes
+        return ' '.join(text.lower().split()).translate(ASCII_PUNCTUATION_TABLE)
+    text = _nfkc(text)
     text = text.lower().strip()
-    text = re.sub(r'\s+', ' ', text)
-    text = re.sub(r'[^\w\s\'-]', '', text)
+    text = WHITESPACE_REGEX.sub(' ', text)
+    text = PUNCTUATION_REGEX.sub('', text)
     return text
 
 
@@ -24,8 +59,11 @@ def normalize_alias(alias: str) -> str:
     if not alias:
         return ""
     normalized = normalize_text(alias)
-    normalized = re.sub(r"['\"]", "", normalized)
-    return normalized.strip()
+    normalized = QUOTE_REGEX.sub("", normalized).strip()
+    # Names repeat across characters and segments; share one object per value
+    if len(normalized) < 64:
+        return sys.intern(normalized)
+    return normalized
 
 
 def generate_character_description(profile: Dict[str, str], name: str = "") -> str:
@@ -98,32 +136,67 @@ def generate_character_description(profile: Dict[str, str], name: str = "") -> s
     return description if description else ""
 
 
+def get_name_norm(char: Dict) -> str:
+    """
+    Get the normalized name of a character record.
+    
+    The value is computed once and cached on the record under '_name_norm',
+    so repeated lookups against the same work_characters list skip normalization.
+    """
+    name_norm = char.get('_name_norm')
+    if name_norm is None:
+        name_norm = normalize_alias(char.get('name', ''))
+        char['_name_norm'] = name_norm
+    return name_norm
+
+
+def build_character_index(work_characters: List[Dict]) -> Dict[str, Dict]:
+    """
+    Index character records by normalized name.
+    
+    If two records normalize to the same name, the first one wins (matching
+    the order a linear scan would find them).
+    """
+    index: Dict[str, Dict] = {}
+    for char in work_characters:
+        index.setdefault(get_name_norm(char), char)
+    return index
+
+
 def find_existing_character(
-    work_characters: List[Dict],
-    name: str
+    character_index: Dict[str, Dict],
+    name: str,
+    name_normalized: Optional[str] = None
 ) -> Optional[Dict]:
     """
     Find an existing character by name match (case-insensitive).
     
     Args:
-        work_characters: List of existing character records
+        character_index: Existing character records keyed by normalized name
+            (see build_character_index)
         name: The character name to find
+        name_normalized: normalize_alias(name), if the caller already has it
     
     Returns:
         Matching character record or None
     """
-    name_normalized = normalize_alias(name)
-    
-    for char in work_characters:
-        char_name_normalized = normalize_alias(char.get('name', ''))
-        
-        if char_name_normalized == name_normalized:
-            return char
-    
-    return None
+    if name_normalized is None:
+        name_normalized = normalize_alias(name)
+    return character_index.get(name_normalized)
 
 
-# merge_aliases function removed - aliases column deprecated
+@lru_cache(maxsize=4096)
+def _normalize_fact_text(text: str) -> str:
+    """Cached normalize_text for fact strings, which repeat across segments of a work."""
+    return normalize_text(text)
+
+
+def _fact_key(text: str, chapter: Any) -> str:
+    """Build a dedupe key from fact text and its chapter/segment reference."""
+    normalized = _normalize_fact_text(text)
+    if chapter:
+        return f"{normalized}__ch{chapter}"
+    return normalized
 
 
 def normalize_fact_for_dedupe(fact: Dict) -> str:
@@ -132,14 +205,7 @@ def normalize_fact_for_dedupe(fact: Dict) -> str:
     
     Combines: normalized fact text + optional chapter/segment reference
     """
-    text = fact.get('fact', '')
-    normalized = normalize_text(text)
-    
-    chapter = fact.get('chapter') or fact.get('segment')
-    if chapter:
-        return f"{normalized}__ch{chapter}"
-    
-    return normalized
+    return _fact_key(fact.get('fact', ''), fact.get('chapter') or fact.get('segment'))
 
 
 def merge_character_facts(
@@ -166,20 +232,24 @@ def merge_character_facts(
             seen_facts.add(key)
             result.append(fact)
     
-    for fact in (new or []):
-        fact_text = fact.get('fact', '').strip()
-        if not fact_text:
+    for fact in (new or ()):
+        if not (fact_text := (fact.get('fact') or '').strip()):
             continue
         
-        new_fact = dict(fact)
-        
-        if 'chapter' not in new_fact and 'segment' not in new_fact:
-            new_fact['segment'] = segment_number
+        needs_segment = 'chapter' not in fact and 'segment' not in fact
+        needs_source = source_id and 'source' not in fact
         
-        if source_id and 'source' not in new_fact:
-            new_fact['source'] = source_id
+        # Only copy when a key has to be added; complete facts are reused as-is
+        if needs_segment or needs_source:
+            new_fact = fact.copy()
+            if needs_segment:
+                new_fact['segment'] = segment_number
+            if needs_source:
+                new_fact['source'] = source_id
+        else:
+            new_fact = fact
         
-        key = normalize_fact_for_dedupe(new_fact)
+        key = _fact_key(fact_text, new_fact.get('chapter') or new_fact.get('segment'))
         if key and key not in seen_facts:
             seen_facts.add(key)
             result.append(new_fact)
@@ -199,20 +269,57 @@ def should_update_description(existing_desc: str, new_desc: str) -> bool:
     - Existing is empty/boilerplate and new is meaningful
     - New is significantly longer and not boilerplate
     """
-    existing_norm = normalize_text(existing_desc or "")
-    new_norm = normalize_text(new_desc or "")
-    
-    if not new_norm:
+    if not new_desc:
         return False
     
-    # Simple check: prefer new if longer and substantial
-    if not existing_norm:
-        return True
+    # Cheap length gate first: prefer new if longer and substantial
+    if len(new_desc) > 50 and len(new_desc) > len(existing_desc or "") * 1.5:
+        return bool(normalize_text(new_desc))
     
-    if len(new_desc) > len(existing_desc) * 1.5 and len(new_desc) > 50:
-        return True
+    # Otherwise only replace an existing description that is effectively empty
+    if normalize_text(existing_desc or ""):
+        return False
     
-    return False
+    return bool(normalize_text(new_desc))
+
+
+def should_process_characters(media_type: str) -> bool:
+    """Character updates are only tracked for novels."""
+    return media_type == 'novel'
+
+
+def _extract_update(char_update: Any) -> Tuple[str, List[Any]]:
+    """Get (name, facts) from a character update dict or CharacterUpdateModel."""
+    # Dicts first: the worker passes model_dump() output
+    if isinstance(char_update, dict):
+        return (char_update.get('name') or '').strip(), char_update.get('facts') or []
+    return (char_update.name or '').strip(), char_update.facts or []
+
+
+def _update_digest(name_normalized: str, facts: List[Dict]) -> str:
+    """Digest of a normalized character update: name plus its fact texts, order-insensitive."""
+    fact_texts = sorted({_normalize_fact_text(f['fact']) for f in facts})
+    payload = '\n'.join([name_normalized, *fact_texts])
+    return hashlib.blake2b(payload.encode('utf-8'), digest_size=16).hexdigest()
+
+
+def _is_unchanged(char_id: str, digest: str) -> bool:
+    """True if the last update this process wrote for char_id had the same digest."""
+    with _recent_char_digests_lock:
+        if _recent_char_digests.get(char_id) != digest:
+            return False
+        _recent_char_digests.move_to_end(char_id)
+        return True
+
+
+def _remember_digests(digests: Dict[str, str]) -> None:
+    """Record digests of successfully written updates, evicting the oldest past CHAR_DIGEST_CACHE_MAX."""
+    with _recent_char_digests_lock:
+        for char_id, digest in digests.items():
+            _recent_char_digests[char_id] = digest
+            _recent_char_digests.move_to_end(char_id)
+        while len(_recent_char_digests) > CHAR_DIGEST_CACHE_MAX:
+            _recent_char_digests.popitem(last=False)
 
 
 def process_character_updates(
@@ -237,11 +344,11 @@ def process_character_updates(
         media_type: Media type (only processes if 'novel')
     
     Returns:
-        Stats dict with counts of inserted/updated/skipped
+        Stats dict with counts of inserted/updated/unchanged/skipped
     """
-    stats = {'inserted': 0, 'updated': 0, 'skipped': 0}
+    stats = {'inserted': 0, 'updated': 0, 'unchanged': 0, 'skipped': 0}
     
-    if media_type != 'novel':
+    if not should_process_characters(media_type):
         logger.info(f"Skipping character updates for media_type={media_type} (novel only)")
         stats['skipped'] = len(character_updates) if character_updates else 0
         return stats
@@ -250,26 +357,19 @@ def process_character_updates(
         return stats
     
     source_id = f"segment_{segment_number}"
+    pending_updates: Dict[str, Dict] = {}  # character id -> row
+    pending_inserts: Dict[str, Dict] = {}  # normalized name -> row
+    pending_digests: Dict[str, str] = {}  # character id -> update digest, recorded once written
+    character_index = build_character_index(work_characters)
     
     for char_update in character_updates:
-        # Support both dict and CharacterUpdateModel
-        if hasattr(char_update, 'name'):
-            # CharacterUpdateModel instance
-            name = (char_update.name or '').strip()
-            facts = char_update.facts or []
-        else:
-            # Dict (backward compatibility)
-            name = (char_update.get('name') or '').strip()
-            facts = char_update.get('facts') or []
+        name, facts = _extract_update(char_update)
         
         if not name:
             logger.debug("Skipping character with empty name")
             stats['skipped'] += 1
             continue
         
-        # Don't generate description - leave empty per user request
-        description = ""
-        
         # Convert facts array to character_facts format for storage
         new_facts = []
         for fact in facts:
@@ -280,37 +380,67 @@ def process_character_updates(
                     'source': source_id
                 })
         
-        existing = find_existing_character(work_characters, name)
+        name_normalized = normalize_alias(name)
+        pending_insert = pending_inserts.get(name_normalized)
+        
+        if pending_insert:
+            # Same new character repeated within this segment; still one insert
+            pending_insert['character_facts'] = merge_character_facts(
+                pending_insert['character_facts'], new_facts, segment_number, source_id
+            )
+            
+            logger.debug(f"Merged repeat of pending character: {name} (facts: {len(pending_insert['character_facts'])})")
+            continue
+        
+        existing = find_existing_character(character_index, name, name_normalized)
         
         if existing:
-            # Merge new facts with existing facts (simple append)
-            existing_facts = existing.get('character_facts', [])
-            merged_facts = existing_facts + new_facts
+            # The model often re-emits a character exactly as in an earlier segment
+            digest = _update_digest(name_normalized, new_facts)
+            if _is_unchanged(existing['id'], digest):
+                stats['unchanged'] += 1
+                logger.debug(f"Update for character {name} unchanged since last write, skipping")
+                continue
+            
+            existing_facts = existing.get('character_facts') or []
+            merged_facts = merge_character_facts(existing_facts, new_facts, segment_number, source_id)
             
-            db_client.update_character(existing['id'], {
+            pending_digests[existing['id']] = digest
+            pending_updates[existing['id']] = {
+                'id': existing['id'],
+                'work_id': work_id,
+                'name': existing['name'],
                 'character_facts': merged_facts,
                 'description': '',  # Keep empty
                 'model_version': model_version
-            })
+            }
             
             existing['character_facts'] = merged_facts
             
             stats['updated'] += 1
             logger.debug(f"Updated character: {name} (facts: {len(merged_facts)})")
         else:
-            new_char = db_client.upsert_character(
-                work_id=work_id,
-                name=name,
-                character_facts=new_facts,
-                description='',  # Keep empty per user request
-                model_version=model_version
-            )
-            
-            if new_char:
-                work_characters.append(new_char)
+            pending_inserts[name_normalized] = {
+                'work_id': work_id,
+                'name': name,
+                'character_facts': merge_character_facts([], new_facts, segment_number, source_id),
+                'description': '',  # Keep empty per user request
+                'model_version': model_version
+            }
             
             stats['inserted'] += 1
             logger.debug(f"Inserted new character: {name}")
     
+    # Flush all writes for this segment in one round-trip per kind
+    if pending_updates:
+        db_client.update_characters_batch(list(pending_updates.values()))
+        _remember_digests(pending_digests)
+    
+    if pending_inserts:
+        new_chars = db_client.insert_characters_batch(list(pending_inserts.values()))
+        for new_char in new_chars:
+            get_name_norm(new_char)
+            work_characters.append(new_char)
+    
     logger.info(f"Character updates complete: {stats}")
     return stats
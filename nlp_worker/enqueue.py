@@ -3,24 +3,39 @@
 import os
 import sys
 import argparse
-from typing import List, Dict, Optional
+from itertools import islice
+from concurrent.futures import ThreadPoolExecutor
+from typing import List, Dict, Iterator, Optional, Set
 from dotenv import load_dotenv
 
 from .utils import get_logger
 from .supabase_client import get_supabase_client
 
-load_dotenv()
+if not os.environ.get('NO_DOTENV'):
+    load_dotenv()
 logger = get_logger(__name__)
 
+# Raw source asset types each media type can be processed from
+REQUIRED_ASSETS = {
+    'novel': frozenset({'raw_html', 'cleaned_text'}),
+    'manhwa': frozenset({'raw_image'}),
+    'anime': frozenset({'raw_subtitle'}),
+}
+RAW_ASSET_TYPES = sorted(frozenset().union(*REQUIRED_ASSETS.values()))
 
-def get_segments_missing_nlp(
+
+def iter_segments_missing_nlp(
     db, 
     limit: Optional[int] = None,
     work_id: Optional[str] = None,
-    edition_id: Optional[str] = None
-) -> List[Dict]:
+    edition_id: Optional[str] = None,
+    media_type: Optional[str] = None
+) -> Iterator[Dict]:
     """
-    Find segments that are missing any NLP outputs using efficient batch query.
+    Yield segments that are missing any NLP outputs using efficient batch queries.
+    
+    The client-side fallback streams one page at a time, so callers can start
+    working before the scan finishes without holding the whole backlog in memory.
     
     Checks for missing:
     - segment_summaries row
@@ -31,44 +46,40 @@ def get_segments_missing_nlp(
         limit: Maximum results to return (applied after filtering)
         work_id: Filter by specific work_id
         edition_id: Filter by specific edition_id
+        media_type: Filter by media type
     """
-    # Try using SQL with LEFT JOINs - much more efficient!
-    query = """
-    SELECT 
-        s.id as segment_id,
-        s.segment_type,
-        s.number,
-        s.title,
-        e.media_type,
-        e.work_id,
-        e.id as edition_id,
-        CASE WHEN ss.segment_id IS NOT NULL THEN true ELSE false END as has_summary,
-        CASE WHEN se.segment_id IS NOT NULL THEN true ELSE false END as has_entities
-    FROM segments s
-    JOIN editions e ON s.edition_id = e.id
-    LEFT JOIN segment_summaries ss ON ss.segment_id = s.id
-    LEFT JOIN segment_entities se ON se.segment_id = s.id
-    WHERE (ss.segment_id IS NULL OR se.segment_id IS NULL)
-    """
-    
-    # Add filters to SQL query
-    if work_id:
-        query += f" AND e.work_id = '{work_id}'"
-    if edition_id:
-        query += f" AND e.id = '{edition_id}'"
-    
-    query += " ORDER BY e.work_id, s.number"
-    
-    if limit:
-        query += f" LIMIT {limit}"
+    # Preferred: server-side filter (migrations/2026-10-16_add_get_segments_missing_nlp_outputs.sql)
+    try:
+        result = db.client.rpc('get_segments_missing_nlp_outputs', {
+            'p_work_id': work_id,
+            'p_edition_id': edition_id,
+            'p_media_type': media_type,
+            'p_limit': limit
+        }).execute()
+    except Exception as e:
+        logger.debug(f"RPC get_segments_missing_nlp_outputs not available: {e}")
+    else:
+        yield from result.data or []
+        return
     
+    # Next best: same filter exposed as a view (migrations/2026-10-16_add_segments_missing_nlp_view.sql)
     try:
-        # Try direct SQL execution via RPC or raw SQL
-        result = db.client.rpc('execute_sql', {'query': query}).execute()
-        if result.data:
-            return result.data
+        view_query = db.client.table('segments_missing_nlp').select('*')
+        if work_id:
+            view_query = view_query.eq('work_id', work_id)
+        if edition_id:
+            view_query = view_query.eq('edition_id', edition_id)
+        if media_type:
+            view_query = view_query.eq('media_type', media_type)
+        view_query = view_query.order('work_id').order('number')
+        if limit:
+            view_query = view_query.limit(limit)
+        result = view_query.execute()
     except Exception as e:
-        logger.debug(f"RPC execute_sql not available: {e}")
+        logger.debug(f"View segments_missing_nlp not available: {e}")
+    else:
+        yield from result.data or []
+        return
     
     # Fallback: use optimized Supabase query with single request
     try:
@@ -81,105 +92,184 @@ def get_segments_missing_nlp(
             logger.info(f"Found {len(edition_ids_to_filter)} editions: {edition_ids_to_filter}")
             if not edition_ids_to_filter:
                 logger.warning(f"No editions found for work_id {work_id}")
-                return []
+                return
         
         if edition_id:
             edition_ids_to_filter = [edition_id]
             logger.info(f"Using edition_id filter: {edition_id}")
         
-        query_builder = db.client.table('segments').select(
-            '''
-            id,
-            segment_type,
-            number,
-            title,
-            edition_id,
-            editions!inner(id, work_id, media_type),
-            segment_summaries!left(segment_id),
-            segment_entities!left(segment_id),
-            segment_assets!left(assets(asset_type))
-            '''
-        )
-        
-        # Filter by edition_id directly (more reliable than nested filter)
-        if edition_ids_to_filter:
-            logger.info(f"Applying edition_id filter, fetching up to 10000 segments")
-            query_builder = query_builder.in_('edition_id', edition_ids_to_filter)
-            # Fetch all segments for this work (no 1000 limit)
-            query_builder = query_builder.limit(10000)
-        elif limit:
-            # Only apply limit if no work/edition filter
-            query_builder = query_builder.limit(limit * 3)
+        # Asset types known at call time are pushed into the embed filter
+        if media_type:
+            asset_types = sorted(REQUIRED_ASSETS.get(media_type, ()))
         else:
-            # Default: fetch first 1000
-            query_builder = query_builder.limit(1000)
+            asset_types = RAW_ASSET_TYPES
         
-        logger.info("Executing segments query...")
-        result = query_builder.execute()
-        logger.info(f"Query returned {len(result.data or [])} segments")
+        found = 0
+        last_id = None
+        page_size = 1000
         
-        segments = []
-        for row in result.data or []:
-            media_type = row['editions']['media_type']
-            
-            # Check if segment has required raw asset based on media type
-            segment_assets = row.get('segment_assets') or []
-            has_raw_asset = False
+        # Keyset pagination on segments.id: each page is an index range scan,
+        # so deep pages cost the same as the first one (no OFFSET).
+        while True:
+            query_builder = db.client.table('segments').select(
+                '''
+                id,
+                segment_type,
+                number,
+                title,
+                edition_id,
+                editions!inner(work_id, media_type),
+                segment_summaries!left(segment_id),
+                segment_entities!left(segment_id),
+                segment_assets!left(assets!inner(asset_type))
+                ''',
+                # Exact total only on the first page, so the scan size is known up front
+                count='exact' if last_id is None else None
+            ).in_('segment_assets.assets.asset_type', asset_types)
             
-            for asset in segment_assets:
-                asset_type = asset.get('assets', {}).get('asset_type', '')
-                if media_type == 'novel' and asset_type in ('raw_html', 'cleaned_text'):
-                    has_raw_asset = True
-                    break
-                elif media_type == 'manhwa' and asset_type == 'raw_image':
-                    has_raw_asset = True
-                    break
-                elif media_type == 'anime' and asset_type == 'raw_subtitle':
-                    has_raw_asset = True
-                    break
-            
-            # Skip segments without raw assets
-            if not has_raw_asset:
-                continue
+            # Filter by edition_id directly (more reliable than nested filter)
+            if edition_ids_to_filter:
+                query_builder = query_builder.in_('edition_id', edition_ids_to_filter)
+            if media_type:
+                query_builder = query_builder.eq('editions.media_type', media_type)
+            if last_id is not None:
+                query_builder = query_builder.gt('id', last_id)
             
-            # Check if outputs exist
-            has_summary = len(row.get('segment_summaries') or []) > 0
-            has_entities = len(row.get('segment_entities') or []) > 0
+            result = query_builder.order('id').limit(page_size).execute()
+            rows = result.data or []
+            if last_id is None:
+                logger.info(f"Scanning {result.count} segments in pages of {page_size}")
+            logger.debug(f"Segments page after {last_id} returned {len(rows)} rows")
             
-            # Only include if missing any output
-            if not (has_summary and has_entities):
-                segments.append({
-                    'segment_id': row['id'],
-                    'segment_type': row['segment_type'],
-                    'number': row['number'],
-                    'title': row.get('title'),
-                    'media_type': media_type,
-                    'work_id': row['editions']['work_id'],
-                    'edition_id': row['editions']['id'],
-                    'has_summary': has_summary,
-                    'has_entities': has_entities
-                })
+            for row in rows:
+                row_media_type = row['editions']['media_type']
                 
-                if limit and len(segments) >= limit:
-                    break
+                # Check if segment has required raw asset based on media type
+                required = REQUIRED_ASSETS.get(row_media_type)
+                if not required or not any(
+                    (asset.get('assets') or {}).get('asset_type') in required
+                    for asset in row.get('segment_assets') or []
+                ):
+                    # Skip segments without raw assets
+                    continue
+                
+                # Check if outputs exist
+                has_summary = len(row.get('segment_summaries') or []) > 0
+                has_entities = len(row.get('segment_entities') or []) > 0
+                
+                # Only include if missing any output
+                if not (has_summary and has_entities):
+                    yield {
+                        'segment_id': row['id'],
+                        'segment_type': row['segment_type'],
+                        'number': row['number'],
+                        'title': row.get('title'),
+                        'media_type': row_media_type,
+                        'work_id': row['editions']['work_id'],
+                        'edition_id': row['edition_id'],
+                        'has_summary': has_summary,
+                        'has_entities': has_entities
+                    }
+                    found += 1
+                    
+                    if limit and found >= limit:
+                        return
+            
+            if len(rows) < page_size:
+                break
+            last_id = rows[-1]['id']
         
-        return segments
+        logger.info(f"Found {found} segments missing NLP outputs")
     except Exception as e:
         logger.error(f"Failed to query missing segments: {e}")
-        return []
 
 
-def check_pending_job(db, segment_id: str) -> bool:
-    """Check if there's already a pending job for this segment."""
-    result = db.client.table('pipeline_jobs').select('id').eq(
-        'segment_id', segment_id
-    ).eq(
-        'job_type', 'summarize'
-    ).in_(
-        'status', ['queued', 'running']
-    ).execute()
+def get_segments_missing_nlp(
+    db, 
+    limit: Optional[int] = None,
+    work_id: Optional[str] = None,
+    edition_id: Optional[str] = None,
+    media_type: Optional[str] = None
+) -> List[Dict]:
+    """Find segments that are missing any NLP outputs (see iter_segments_missing_nlp)."""
+    return list(iter_segments_missing_nlp(db, limit, work_id, edition_id, media_type))
+
+
+def count_segments_missing_nlp(
+    db,
+    work_id: Optional[str] = None,
+    media_type: Optional[str] = None
+) -> int:
+    """
+    Count segments missing NLP outputs.
+    
+    Uses a HEAD request with an exact count against the segments_missing_nlp view,
+    so no rows are transferred. Falls back to a full scan if the view is missing.
+    """
+    try:
+        query = db.client.table('segments_missing_nlp').select(
+            'segment_id', count='exact', head=True
+        )
+        if work_id:
+            query = query.eq('work_id', work_id)
+        if media_type:
+            query = query.eq('media_type', media_type)
+        return query.execute().count or 0
+    except Exception as e:
+        logger.debug(f"View segments_missing_nlp not available for count: {e}")
+    
+    return sum(1 for _ in iter_segments_missing_nlp(db, work_id=work_id, media_type=media_type))
+
+
+def get_pending_segment_ids(
+    db,
+    segment_ids: List[str],
+    chunk_size: int = 200,
+    max_workers: int = 4
+) -> Set[str]:
+    """
+    Get the subset of segment_ids that already have a queued/running job.
     
-    return bool(result.data)
+    Uses the pending_segment_ids RPC (one round trip). Without it, queries in chunks
+    to keep the PostgREST IN (...) filter under URL length limits, running up to
+    max_workers chunk queries concurrently.
+    """
+    if not segment_ids:
+        return set()
+    
+    try:
+        result = db.client.rpc('pending_segment_ids', {'ids': segment_ids}).execute()
+        # SETOF uuid comes back as bare values or {"pending_segment_ids": ...} rows
+        return {
+            row['pending_segment_ids'] if isinstance(row, dict) else row
+            for row in result.data or []
+        }
+    except Exception as e:
+        logger.debug(f"RPC pending_segment_ids not available: {e}")
+    
+    def _fetch(chunk: List[str]) -> List[str]:
+        result = db.client.table('pipeline_jobs').select('segment_id').in_(
+            'segment_id', chunk
+        ).eq(
+            'job_type', 'summarize'
+        ).in_(
+            'status', ['queued', 'running']
+        ).execute()
+        return [row['segment_id'] for row in result.data or []]
+    
+    chunks = [segment_ids[i:i + chunk_size] for i in range(0, len(segment_ids), chunk_size)]
+    pending: Set[str] = set()
+    
+    if len(chunks) <= 1:
+        for chunk in chunks:
+            pending.update(_fetch(chunk))
+        return pending
+    
+    with ThreadPoolExecutor(max_workers=min(max_workers, len(chunks))) as executor:
+        for ids in executor.map(_fetch, chunks):
+            pending.update(ids)
+    
+    return pending
 
 
 def enqueue_jobs(
@@ -187,61 +277,85 @@ def enqueue_jobs(
     limit: Optional[int] = None,
     work_id: Optional[str] = None,
     media_type: Optional[str] = None,
-    dry_run: bool = False
+    dry_run: bool = False,
+    chunk_size: int = 500
 ) -> Dict[str, int]:
     """
     Enqueue NLP pack jobs for segments missing processing.
     
     Args:
-    # Pass work_id to query to avoid pagination issues
-    segments = get_segments_missing_nlp(db, limit=None, work_id=work_id)
+        force: Enqueue even if outputs exist
+        limit: Maximum number of jobs to enqueue
+        work_id: Filter by specific work_id
+        media_type: Filter by media type
         dry_run: If True, only show what would be enqueued
+        chunk_size: Segments checked and enqueued per batch
     
     Returns:
         Stats dict with counts
     """
     db = get_supabase_client()
     
-    logger.info("Finding segments missing NLP processing...")
-    # Pass work_id to query function to avoid pagination issues
-    segments = get_segments_missing_nlp(db, limit=None, work_id=work_id)
-    
-    if media_type:
-        segments = [s for s in segments if s['media_type'] == media_type]
+    if not dry_run:
+        # Preferred: anti-join, pending check and insert in one transaction
+        # (migrations/2026-10-16_add_enqueue_missing_nlp_jobs.sql)
+        try:
+            result = db.client.rpc('enqueue_missing_nlp_jobs', {
+                'p_force': force,
+                'p_limit': limit,
+                'p_work_id': work_id,
+                'p_media_type': media_type
+            }).execute()
+            if result.data:
+                stats = result.data[0]
+                logger.info(f"Enqueued {stats['enqueued']} jobs")
+                return stats
+        except Exception as e:
+            logger.debug(f"RPC enqueue_missing_nlp_jobs not available: {e}")
     
-    logger.info(f"Found {len(segments)} segments missing NLP")
-    
-    # Apply limit after all filtering
-    if limit:
-        segments = segments[:limit]
-        logger.info(f"Limited to {len(segments)} segments")
-    
-    logger.info(f"Will process {len(segments)} segments")
+    logger.info("Finding segments missing NLP processing...")
+    # Filters and limit are applied by the query itself
+    segments = iter_segments_missing_nlp(db, limit=limit, work_id=work_id, media_type=media_type)
     
     stats = {'enqueued': 0, 'skipped_pending': 0, 'skipped_complete': 0}
+    seen = 0
     
-    for seg in segments:
-        segment_id = seg['segment_id']
-        
-        if not force:
-            has_all = seg.get('has_cleaned', False) and seg.get('has_summary', False) and seg.get('has_entities', False)
-            if has_all:
-                stats['skipped_complete'] += 1
-                continue
+    while True:
+        chunk = list(islice(segments, chunk_size))
+        if not chunk:
+            break
+        seen += len(chunk)
         
-        if check_pending_job(db, segment_id):
-            logger.debug(f"Segment {segment_id} already has pending job")
-            stats['skipped_pending'] += 1
-            continue
+        pending_segment_ids = get_pending_segment_ids(db, [s['segment_id'] for s in chunk])
+        to_enqueue: List[Dict] = []
         
-        if dry_run:
-            logger.info(f"[DRY RUN] Would enqueue: {seg['media_type']} {seg['segment_type']}-{seg['number']}")
-            stats['enqueued'] += 1
-            continue
+        for seg in chunk:
+            segment_id = seg['segment_id']
+            
+            if not force:
+                has_all = seg.get('has_summary', False) and seg.get('has_entities', False)
+                if has_all:
+                    stats['skipped_complete'] += 1
+                    continue
+            
+            if segment_id in pending_segment_ids:
+                logger.debug(f"Segment {segment_id} already has pending job")
+                stats['skipped_pending'] += 1
+                continue
+            
+            if dry_run:
+                logger.info(f"[DRY RUN] Would enqueue: {seg['media_type']} {seg['segment_type']}-{seg['number']}")
+                stats['enqueued'] += 1
+                continue
+            
+            logger.debug(f"Enqueueing job for segment {segment_id}: {seg['media_type']} {seg['segment_type']}-{seg['number']}")
+            to_enqueue.append(seg)
         
-        db.enqueue_nlp_job(segment_id, force=force)
-        logger.info(f"Enqueued job for segment {segment_id}: {seg['media_type']} {seg['segment_type']}-{seg['number']}")
-        stats['enqueued'] += 1
+        if to_enqueue:
+            stats['enqueued'] += db.enqueue_nlp_jobs_bulk(to_enqueue, force=force)
+            logger.info(f"Enqueued {stats['enqueued']} jobs so far")
+    
+    logger.info(f"Processed {seen} segments missing NLP")
     
     return stats
 
@@ -280,6 +394,11 @@ def main():
         action='store_true',
         help='Show what would be enqueued without actually enqueueing'
     )
+    parser.add_argument(
+        '--count', '-c',
+        action='store_true',
+        help='Only print how many segments are missing NLP outputs'
+    )
     
     args = parser.parse_args()
     
@@ -289,6 +408,15 @@ def main():
         logger.error(f"Missing required environment variables: {missing}")
         sys.exit(1)
     
+    if args.count:
+        count = count_segments_missing_nlp(
+            get_supabase_client(),
+            work_id=args.work_id,
+            media_type=args.media_type
+        )
+        logger.info(f"Segments missing NLP: {count}")
+        return
+    
     stats = enqueue_jobs(
         force=args.force,
         limit=args.limit,
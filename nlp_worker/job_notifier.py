@@ -0,0 +1,101 @@
+"""Postgres LISTEN/NOTIFY wake-ups for the worker poll loop."""
+
+import os
+import time
+import select
+from typing import Optional
+from .utils import get_logger
+
+logger = get_logger(__name__)
+
+try:
+    import psycopg2
+    from psycopg2.extensions import ISOLATION_LEVEL_AUTOCOMMIT
+except ImportError:
+    psycopg2 = None
+
+JOBS_CHANNEL = 'pipeline_jobs_new'
+
+
+class JobNotifier:
+    """
+    Waits for new-job notifications instead of sleeping a fixed interval.
+    
+    Requires psycopg2 and DATABASE_URL (direct Postgres connection string).
+    Without them, or if the connection drops, wait() degrades to time.sleep().
+    """
+    
+    def __init__(self, channel: str = JOBS_CHANNEL):
+        self.channel = channel
+        self.dsn = os.environ.get('DATABASE_URL')
+        self.conn = None
+        
+        if psycopg2 is None or not self.dsn:
+            logger.info("LISTEN/NOTIFY disabled (needs psycopg2 and DATABASE_URL), using interval polling")
+            self.dsn = None
+            return
+        
+        self._connect()
+    
+    def _connect(self) -> None:
+        """Open an autocommit connection and LISTEN on the channel."""
+        try:
+            conn = psycopg2.connect(self.dsn)
+            conn.set_isolation_level(ISOLATION_LEVEL_AUTOCOMMIT)
+            with conn.cursor() as cur:
+                cur.execute(f"LISTEN {self.channel};")
+            self.conn = conn
+            logger.info(f"Listening for job notifications on '{self.channel}'")
+        except Exception as e:
+            logger.warning(f"Failed to LISTEN on '{self.channel}', using interval polling: {e}")
+            self.conn = None
+    
+    @property
+    def listening(self) -> bool:
+        """True while the LISTEN connection is open."""
+        return self.conn is not None
+    
+    def _close(self) -> None:
+        if self.conn is not None:
+            try:
+                self.conn.close()
+            except Exception:
+                pass
+            self.conn = None
+    
+    def wait(self, timeout: float) -> bool:
+        """
+        Block until a job notification arrives or timeout elapses.
+        
+        Args:
+            timeout: Maximum seconds to wait (safety-net poll interval)
+        
+        Returns:
+            True if woken by a notification, False on timeout or fallback sleep
+        """
+        if self.conn is None and self.dsn:
+            self._connect()
+        
+        if self.conn is None:
+            time.sleep(timeout)
+            return False
+        
+        try:
+            if not self.conn.notifies:
+                ready, _, _ = select.select([self.conn], [], [], timeout)
+                if not ready:
+                    return False
+                self.conn.poll()
+            
+            notified = bool(self.conn.notifies)
+            self.conn.notifies.clear()
+            return notified
+        except Exception as e:
+            logger.warning(f"Job notification connection lost: {e}")
+            self._close()
+            time.sleep(timeout)
+            return False
+    
+    def close(self) -> None:
+        """Close the LISTEN connection."""
+        self._close()
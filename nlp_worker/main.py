@@ -2,31 +2,64 @@
 
 import os
 import sys
-import time
 import argparse
 import traceback
 import threading
+from datetime import datetime
+from collections import deque, namedtuple
 from typing import Dict, Any, Optional, List
-from concurrent.futures import ThreadPoolExecutor
+from concurrent.futures import ThreadPoolExecutor, Future, wait
 from dotenv import load_dotenv
 
-# Load environment variables from .env file
-load_dotenv()
+# Load environment variables from .env file (set NO_DOTENV=1 to skip the lookup)
+if not os.environ.get('NO_DOTENV'):
+    load_dotenv()
 
-from .utils import get_logger, count_paragraphs, count_subtitle_blocks
+from .utils import get_logger, count_paragraphs, count_subtitle_blocks, release_memory, current_rss_mb
 from .supabase_client import get_supabase_client, SupabaseClient
 from .r2_client import get_r2_client, R2Client
 from .qwen_client import get_qwen_client, QwenClient
-from .character_merge import process_character_updates
-from .text_extractors import extract_subtitle_text, extract_novel_text, extract_manhwa_text
+from .job_notifier import JobNotifier
+from .text_cache import TextCache, text_cache_key
+from .character_merge import process_character_updates, should_process_characters
+from .text_extractors import (
+    extract_subtitle_text,
+    extract_novel_text,
+    extract_manhwa_page,
+    join_manhwa_pages
+)
 
 logger = get_logger(__name__)
 
-POLL_SECONDS = int(os.environ.get('POLL_SECONDS', '3'))
+
+def _default_num_workers() -> int:
+    """Worker threads mostly wait on the model server and R2, so scale past the CPU count."""
+    try:
+        cpus = len(os.sched_getaffinity(0))
+    except AttributeError:  # Not available on macOS/Windows
+        cpus = os.cpu_count() or 1
+    return min(8, 4 * cpus)  # Capped to stay within the Supabase connection pool
+
+
+POLL_SECONDS = int(os.environ.get('POLL_SECONDS', '3'))  # Longest idle wait between polls
+POLL_SECONDS_MIN = float(os.environ.get('POLL_SECONDS_MIN', '0.25'))  # First idle wait; doubles up to POLL_SECONDS
+NOTIFY_POLL_SECONDS = int(os.environ.get('NOTIFY_POLL_SECONDS', '60'))  # Longest idle wait while LISTEN is connected
 MAX_RETRIES_PER_JOB = int(os.environ.get('MAX_RETRIES_PER_JOB', '2'))
-NUM_WORKERS = int(os.environ.get('NUM_WORKERS', '2'))
-MAX_JOBS_PER_RESTART = int(os.environ.get('MAX_JOBS_PER_RESTART', '150'))  # Restart after N jobs to prevent memory leaks
+NUM_WORKERS = int(os.environ.get('NUM_WORKERS', str(_default_num_workers())))
+POLL_BATCH_SIZE = int(os.environ.get('POLL_BATCH_SIZE', str(NUM_WORKERS)))  # Jobs claimed per poll, shared by worker threads
+MAX_JOBS_PER_RESTART = int(os.environ.get('MAX_JOBS_PER_RESTART', '0'))  # Restart after N jobs; 0 disables
+MAX_RSS_MB = int(os.environ.get('MAX_RSS_MB', '2048'))  # Restart once resident memory reaches this; 0 disables
+GC_EVERY_JOBS = int(os.environ.get('GC_EVERY_JOBS', '25'))  # Full GC + malloc_trim after this many completed jobs
 MODEL_VERSION = os.environ.get('MODEL_VERSION', 'qwen2.5-7b-awq_nlp_pack_v1')
+PREFETCH_DEPTH = 2  # Claimed jobs whose inputs may be loaded ahead of processing
+ENABLE_TEXT_CACHE = os.environ.get('ENABLE_TEXT_CACHE', '').lower() in ('1', 'true', 'yes')  # Reuse extracted text on reruns
+PARTIAL_REBUILD_MISSING_ONLY = os.environ.get('PARTIAL_REBUILD_MISSING_ONLY', '1').lower() in ('1', 'true', 'yes')  # Generate only missing outputs
+COMPLETE_BATCH_SIZE = int(os.environ.get('COMPLETE_BATCH_SIZE', str(NUM_WORKERS)))  # Flush completions at this many
+COMPLETE_BATCH_DELAY_MS = int(os.environ.get('COMPLETE_BATCH_DELAY_MS', '20'))  # Max buffering delay; 0 writes each job directly
+COMPLETE_RETRY_SECONDS = 5  # Delay before retrying completions that failed to write
+MAX_ERROR_LEN = 4096  # Longest error message stored on a job row
+
+PrefetchedJob = namedtuple('PrefetchedJob', 'segment existing source_text extraction_stats work_title')
 
 
 class NLPPackWorker:
@@ -34,20 +67,69 @@ class NLPPackWorker:
     
     def __init__(self, dry_run: bool = False):
         self.dry_run = dry_run
-        self.db = get_supabase_client() if not dry_run else None
-        self.r2 = get_r2_client() if not dry_run else None
+        if not dry_run:
+            # Fail fast on missing credentials; dry-run connects on first read
+            get_supabase_client()
+            get_r2_client()
         self.qwen = get_qwen_client()
         self._poll_lock = threading.Lock()  # Prevent race conditions in concurrent polling
+        self._claimed_jobs: deque = deque()  # Jobs claimed by the last poll, guarded by _poll_lock
+        self._prefetched: Dict[str, Future] = {}  # job_id -> PrefetchedJob future, guarded by _poll_lock
+        self._prefetch_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='nlp-prefetch')
         self._jobs_processed = 0  # Track jobs for graceful restart
         self._jobs_lock = threading.Lock()  # Protect job counter
+        self._completions: List[Dict[str, Any]] = []  # Buffered job results, guarded by _completions_lock
+        self._completions_lock = threading.Lock()
+        self._completions_timer: Optional[threading.Timer] = None
+        self._text_cache = TextCache() if ENABLE_TEXT_CACHE else None
+        self._stop = threading.Event()  # Set on shutdown/restart; workers drain claimed jobs and exit
+        self._claim_ahead = False  # Claim the next batch during model calls; daemon mode only
+        self._wake = threading.Event()  # Set when a job notification arrives, wakes idle worker threads
+        self._idle_poll_max = POLL_SECONDS  # Idle backoff cap; raised to NOTIFY_POLL_SECONDS while listening
+        self._io_executor = ThreadPoolExecutor(max_workers=4, thread_name_prefix='nlp-io')  # Overlapped DB/R2 calls within a job
         logger.info(f"NLP Pack Worker initialized (dry_run={dry_run})")
     
-    def _init_clients_for_read(self):
-        """Initialize clients for reading (used in dry-run mode)."""
-        if self.db is None:
-            self.db = get_supabase_client()
-        if self.r2 is None:
-            self.r2 = get_r2_client()
+    @property
+    def db(self) -> SupabaseClient:
+        """Process-wide Supabase client (shared connection pool)."""
+        return get_supabase_client()
+    
+    @property
+    def r2(self) -> R2Client:
+        """Process-wide R2 client (shared connection pool)."""
+        return get_r2_client()
+    
+    def _extract_anime(self, assets: List[Dict], stats: Dict[str, Any]) -> Optional[str]:
+        """Extract dialogue text from the first raw_subtitle asset."""
+        asset = assets[0]
+        content = self.r2.download_text(asset['r2_key'])
+        stats['subtitle_blocks'] = count_subtitle_blocks(content)
+        return extract_subtitle_text(content, asset['r2_key'])
+    
+    def _extract_novel(self, assets: List[Dict], stats: Dict[str, Any]) -> Optional[str]:
+        """Extract chapter text from the first raw_html / cleaned_text asset."""
+        content = self.r2.download_text(assets[0]['r2_key'])
+        text = extract_novel_text(content)
+        stats['paragraph_count'] = count_paragraphs(text)
+        return text
+    
+    def _extract_manhwa(self, assets: List[Dict], stats: Dict[str, Any]) -> Optional[str]:
+        """Extract page text from all ocr_json assets."""
+        stats['page_count'] = len(assets)
+        # Parse each page's raw bytes as its download completes instead of holding every blob
+        pages = []
+        for i, content in self.r2.iter_downloads([asset['r2_key'] for asset in assets]):
+            page = extract_manhwa_page(assets[i], content)
+            if page:
+                pages.append(page)
+        return join_manhwa_pages(pages)
+    
+    # media_type -> (asset types to try in order, extractor)
+    SOURCE_EXTRACTORS = {
+        'anime': (('raw_subtitle',), _extract_anime),
+        'novel': (('raw_html', 'cleaned_text'), _extract_novel),
+        'manhwa': (('ocr_json',), _extract_manhwa),
+    }
     
     def extract_source_text(
         self,
@@ -60,8 +142,6 @@ class NLPPackWorker:
         Returns:
             (extracted_text, extraction_stats)
         """
-        self._init_clients_for_read()
-        
         stats = {
             'media_type': media_type,
             'page_count': 0,
@@ -69,78 +149,116 @@ class NLPPackWorker:
             'subtitle_blocks': 0
         }
         
-        if media_type == 'anime':
-            assets = self.db.get_segment_assets(segment_id, 'raw_subtitle')
-            if not assets:
-                logger.error(f"No raw_subtitle asset found for segment {segment_id}")
-                return None, stats
-            
-            asset = assets[0]
-            content = self.r2.download_text(asset['r2_key'])
-            text = extract_subtitle_text(content, asset['r2_key'])
-            stats['subtitle_blocks'] = count_subtitle_blocks(content)
-            return text, stats
-        
-        elif media_type == 'novel':
-            # Try raw_html first, then cleaned_text as fallback
-            assets = self.db.get_segment_assets(segment_id, 'raw_html')
-            if not assets:
-                assets = self.db.get_segment_assets(segment_id, 'cleaned_text')
-            
-            if not assets:
-                logger.error(f"No raw_html or cleaned_text asset found for segment {segment_id}")
-                return None, stats
-            
-            asset = assets[0]
-            content = self.r2.download_text(asset['r2_key'])
-            text = extract_novel_text(content)
-            stats['paragraph_count'] = count_paragraphs(text)
-            return text, stats
-        
-        elif media_type == 'manhwa':
-            assets = self.db.get_segment_assets(segment_id, 'ocr_json')
-            if not assets:
-                logger.error(f"No ocr_json assets found for segment {segment_id}")
-                return None, stats
-            
-            stats['page_count'] = len(assets)
-            ocr_contents = []
-            for asset in assets:
-                content = self.r2.download_text(asset['r2_key'])
-                ocr_contents.append(content)
-            
-            text = extract_manhwa_text(assets, ocr_contents)
-            return text, stats
-        
-        else:
+        entry = self.SOURCE_EXTRACTORS.get(media_type)
+        if entry is None:
             logger.error(f"Unknown media type: {media_type}")
             return None, stats
+        
+        asset_types, extractor = entry
+        assets = []
+        for asset_type in asset_types:
+            assets = self.db.get_segment_assets(segment_id, asset_type)
+            if assets:
+                break
+        
+        if not assets:
+            logger.error(f"No {' or '.join(asset_types)} asset found for segment {segment_id}")
+            return None, stats
+        
+        cache_key = text_cache_key(media_type, assets) if self._text_cache else None
+        if cache_key:
+            cached = self._text_cache.get(cache_key)
+            if cached:
+                logger.info(f"Using cached source text for segment {segment_id}")
+                stats.update(cached['stats'])
+                return cached['text'], stats
+        
+        text = extractor(self, assets, stats)
+        if cache_key and text:
+            self._text_cache.put(cache_key, {'text': text, 'stats': stats})
+        return text, stats
     
-    def check_existing_outputs(
-        self,
-        segment_id: str
-    ) -> Dict[str, bool]:
-        """Check which outputs already exist."""
-        self._init_clients_for_read()
-        
-        existing = {
-            'segment_summaries': False,
-            'segment_entities': False
-        }
+    def _load_job_inputs(self, job: Dict[str, Any]) -> PrefetchedJob:
+        """
+        Read-only half of process_job: segment, output status, source text and work title.
         
-        if self.db.get_segment_summary(segment_id):
-            existing['segment_summaries'] = True
+        Source text and title are only loaded when the job will actually run the model.
+        """
+        segment_id = job['segment_id']
+        force = job.get('input', {}).get('force', False)
         
-        if self.db.get_segment_entities(segment_id):
-            existing['segment_entities'] = True
+        if force:
+            # Forced jobs rewrite every output, so don't look up which exist
+            segment = self.db.get_segment_with_edition(segment_id)
+            existing = {'segment_summaries': False, 'segment_entities': False}
+        else:
+            segment, existing = self.db.get_segment_and_output_status(segment_id)
+        if not segment or (all(existing.values()) and not force):
+            return PrefetchedJob(segment, existing, None, {}, None)
         
-        return existing
+        edition = segment['editions']
+        # Work title is independent of the source text; fetch it while extracting
+        work_title_future = self._io_executor.submit(self.db.get_work_title, edition['work_id'])
+        source_text, extraction_stats = self.extract_source_text(segment_id, edition['media_type'])
+        return PrefetchedJob(segment, existing, source_text, extraction_stats, work_title_future.result())
     
+    def _prefetch_next_job(self, claim: bool = True) -> None:
+        """
+        Start loading inputs for the next claimed job that isn't prefetched yet.
+        
+        Args:
+            claim: If nothing is claimed locally, claim the next job in the background first
+        """
+        with self._poll_lock:
+            if len(self._prefetched) >= PREFETCH_DEPTH:
+                return
+            if not self._claimed_jobs:
+                if claim and self._claim_ahead and not self._stop.is_set() and self._restart_reason() is None:
+                    self._prefetch_executor.submit(self._claim_and_prefetch)
+                return
+            job = next((j for j in self._claimed_jobs if j['id'] not in self._prefetched), None)
+            if job is None:
+                return
+            self._prefetched[job['id']] = self._prefetch_executor.submit(self._load_job_inputs, job)
     
-    def process_job(self, job: Dict[str, Any]) -> Dict[str, Any]:
+    def _claim_and_prefetch(self) -> None:
+        """
+        Claim one job while a model call runs, then prefetch it.
+        
+        Only one: a claimed job is marked running with started_at set, and a full
+        batch could wait behind several model calls past JOB_TIMEOUT_MINUTES and
+        be requeued by reset_stale_jobs while still held here.
+        """
+        try:
+            with self._poll_lock:
+                if not self._claimed_jobs and not self._stop.is_set():
+                    self._claimed_jobs.extend(self.db.poll_next_jobs(batch_size=1))
+                claimed = bool(self._claimed_jobs)
+        except Exception as e:
+            logger.warning(f"Background job claim failed: {e}")
+            return
+        if claimed:
+            self._wake.set()  # An idle worker can start on it right away
+            self._prefetch_next_job(claim=False)
+    
+    def _prefetched_inputs(self, job_id: str, future: Optional[Future]) -> Optional[PrefetchedJob]:
+        """Result of a prefetch started for this job, or None if there was none or it failed."""
+        if future is None:
+            return None
+        try:
+            return future.result()
+        except Exception as e:
+            logger.warning(f"Prefetch for job {job_id} failed, reloading: {e}")
+            return None
+    
+    def process_job(self, job: Dict[str, Any], prefetched: Optional[PrefetchedJob] = None) -> Dict[str, Any]:
         """
         Process a single NLP pack job with metrics and partial idempotency.
         
+        Args:
+            job: pipeline_jobs row
+            prefetched: Inputs already loaded by _prefetch_next_job; loaded inline when None
+        
         Returns:
             Output dict with stats for pipeline_jobs.output
         """
@@ -151,8 +269,8 @@ class NLPPackWorker:
         
         logger.info(f"Processing job {job_id} for segment {segment_id}")
         
-        self._init_clients_for_read()
-        segment = self.db.get_segment_with_edition(segment_id)
+        inputs = prefetched or self._load_job_inputs(job)
+        segment, existing = inputs.segment, inputs.existing
         if not segment:
             raise ValueError(f"Segment {segment_id} not found")
         
@@ -165,16 +283,16 @@ class NLPPackWorker:
         
         logger.info(f"Segment {segment_id}: {media_type} {segment_type}-{segment_number}, work={work_id}")
         
-        existing = self.check_existing_outputs(segment_id)
         all_exist = all(existing.values())
         
+        job_stats = {
+            'media_type': media_type,
+            'segment_type': segment_type,
+            'segment_number': segment_number
+        }
         output_result = {
             'model_version': MODEL_VERSION,
-            'stats': {
-                'media_type': media_type,
-                'segment_type': segment_type,
-                'segment_number': segment_number
-            }
+            'stats': job_stats
         }
         
         if all_exist and not force:
@@ -186,37 +304,53 @@ class NLPPackWorker:
                 **output_result
             }
         
-        source_text, extraction_stats = self.extract_source_text(segment_id, media_type)
+        source_text = inputs.source_text
         if not source_text:
             raise ValueError(f"Failed to extract source text for segment {segment_id}")
         
-        output_result['stats'].update(extraction_stats)
+        job_stats.update(inputs.extraction_stats)
         logger.info(f"Extracted {len(source_text)} chars of source text")
         
-        # Get work title for context isolation
-        work_title = self.db.get_work_title(work_id)
+        # Work title for context isolation
+        work_title = inputs.work_title
         logger.info(f"Processing work: {work_title}")
         
-        model_output, model_stats = self.qwen.process_text(source_text, media_type, work_title)
+        # Model call dominates job time; load the next claimed job's inputs meanwhile
+        self._prefetch_next_job()
+        
+        # Partial retry: don't spend output tokens regenerating an output that's already stored
+        sections = None
+        if PARTIAL_REBUILD_MISSING_ONLY and not force and any(existing.values()):
+            sections = ()
+            if not existing['segment_summaries']:
+                sections += ('segment_summary',)
+            if not existing['segment_entities']:
+                sections += ('segment_entities',)
+            if should_process_characters(media_type):
+                sections += ('character_updates',)
+            logger.info(f"Partial rebuild, requesting only: {', '.join(sections)}")
+        
+        model_output, model_stats = self.qwen.process_text(source_text, media_type, work_title, sections=sections)
         if not model_output:
             raise ValueError("Model processing failed to produce valid output")
         
-        output_result['stats'].update(model_stats)
+        job_stats.update(model_stats)
         output_result['upserted'] = True
         
+        # Independent writes; run concurrently so the tail costs ~one round trip
+        writes: Dict[str, Any] = {}
+        outputs: Dict[str, Dict] = {}
+        
         if not existing['segment_summaries'] or force:
             if self.dry_run:
                 logger.info(f"[DRY RUN] Would upsert segment summary")
             else:
                 summary_data = model_output['segment_summary']
-                self.db.upsert_segment_summary(
-                    segment_id=segment_id,
-                    edition_id=edition_id,
-                    summary=summary_data.get('summary', ''),
-                    summary_short=summary_data.get('summary_short', ''),
-                    events=summary_data.get('events', []),
-                    model_version=MODEL_VERSION
-                )
+                outputs['summary'] = {
+                    'summary': summary_data.get('summary', ''),
+                    'summary_short': summary_data.get('summary_short', ''),
+                    'events': summary_data.get('events', [])
+                }
             output_result['summary_upserted'] = True
         else:
             logger.info("Segment summary already exists, skipped upsert")
@@ -226,18 +360,22 @@ class NLPPackWorker:
             if self.dry_run:
                 logger.info(f"[DRY RUN] Would upsert segment entities")
             else:
-                self.db.upsert_segment_entities(
-                    segment_id=segment_id,
-                    edition_id=edition_id,
-                    entities=model_output['segment_entities'],
-                    model_version=MODEL_VERSION
-                )
+                outputs['entities'] = model_output['segment_entities']
             output_result['entities_upserted'] = True
         else:
             logger.info("Segment entities already exists, skipped upsert")
             output_result['entities_skipped'] = True
         
-        if media_type == 'novel':
+        if outputs:
+            # Summary and entities go in one call; characters need the Python merge
+            writes['outputs'] = lambda: self.db.upsert_segment_outputs(
+                segment_id=segment_id,
+                edition_id=edition_id,
+                model_version=MODEL_VERSION,
+                **outputs
+            )
+        
+        if should_process_characters(media_type):
             character_updates = model_output.get('character_updates', [])
             logger.info(f"Character updates received from model: {len(character_updates)} updates")
             
@@ -245,24 +383,36 @@ class NLPPackWorker:
                 logger.info(f"Processing {len(character_updates)} character updates for work {work_id}")
                 if self.dry_run:
                     logger.info(f"[DRY RUN] Would process {len(character_updates)} character updates")
-                    output_result['characters'] = {'would_process': len(character_updates)}
+                    char_result = {'would_process': len(character_updates)}
+                    output_result['characters'] = char_result
+                    logger.info(f"Character processing result: {char_result}")
                 else:
-                    work_characters = self.db.get_work_characters(work_id)
-                    logger.info(f"Fetched {len(work_characters)} existing characters for work {work_id}")
-                    char_stats = process_character_updates(
-                        work_id=work_id,
-                        work_characters=work_characters,
-                        character_updates=character_updates,
-                        segment_number=segment_number,
-                        model_version=MODEL_VERSION,
-                        db_client=self.db,
-                        media_type=media_type
-                    )
-                    output_result['characters'] = char_stats
-                logger.info(f"Character processing result: {output_result.get('characters')}")
+                    def _write_characters() -> Dict[str, int]:
+                        work_characters = self.db.get_work_characters(work_id)
+                        logger.info(f"Fetched {len(work_characters)} existing characters for work {work_id}")
+                        return process_character_updates(
+                            work_id=work_id,
+                            work_characters=work_characters,
+                            character_updates=character_updates,
+                            segment_number=segment_number,
+                            model_version=MODEL_VERSION,
+                            db_client=self.db,
+                            media_type=media_type
+                        )
+                    writes['characters'] = _write_characters
             else:
                 logger.info("No character updates returned from model for this segment")
         
+        if writes:
+            futures = {name: self._io_executor.submit(write) for name, write in writes.items()}
+            # Let every write finish before surfacing the first failure
+            wait(futures.values())
+            results = {name: future.result() for name, future in futures.items()}
+            char_result = results.get('characters')
+            if char_result is not None:
+                output_result['characters'] = char_result
+                logger.info(f"Character processing result: {char_result}")
+        
         return output_result
     
     def process_segment_direct(self, segment_id: str) -> Dict[str, Any]:
@@ -282,10 +432,61 @@ class NLPPackWorker:
         }
         return self.process_job(fake_job)
     
-    def run_once(self) -> bool:
+    def _complete_job(self, job_id: str, output: Optional[Dict] = None, error: Optional[str] = None) -> None:
+        """Record a job result, buffering it briefly so nearby completions share one write."""
+        if error is not None and len(error) > MAX_ERROR_LEN:
+            error = error[:MAX_ERROR_LEN - 3] + '...'
+        completion = {'id': job_id, 'finished_at': datetime.utcnow().isoformat(), 'output': output, 'error': error}
+        
+        with self._completions_lock:
+            self._completions.append(completion)
+            full = COMPLETE_BATCH_DELAY_MS <= 0 or len(self._completions) >= COMPLETE_BATCH_SIZE
+            if not full:
+                self._schedule_flush(COMPLETE_BATCH_DELAY_MS / 1000)
+        if full:
+            self.flush_completions()
+    
+    def _schedule_flush(self, delay: float) -> None:
+        """Start the flush timer unless one is pending; caller holds _completions_lock."""
+        if self._completions_timer is None:
+            self._completions_timer = threading.Timer(delay, self.flush_completions)
+            self._completions_timer.daemon = True
+            self._completions_timer.start()
+    
+    def flush_completions(self) -> None:
+        """
+        Write all buffered job results now.
+        
+        Runs on the timer thread too, so errors are logged here rather than raised;
+        unwritten results go back in the buffer and are retried after
+        COMPLETE_RETRY_SECONDS instead of leaving the jobs running until a stale reset.
+        """
+        with self._completions_lock:
+            batch, self._completions = self._completions, []
+            timer, self._completions_timer = self._completions_timer, None
+        if timer is not None:
+            timer.cancel()
+        if not batch:
+            return
+        
+        try:
+            failed = self.db.complete_jobs(batch)
+        except Exception as e:
+            logger.error(f"Failed to record {len(batch)} job completions: {e}")
+            failed = batch
+        if failed:
+            with self._completions_lock:
+                self._completions[:0] = failed
+                if not self._stop.is_set():
+                    self._schedule_flush(COMPLETE_RETRY_SECONDS)
+    
+    def run_once(self, poll: bool = True) -> bool:
         """
         Poll and process one job.
         
+        Args:
+            poll: Claim new jobs if none are queued locally; False only drains claimed jobs
+        
         Returns:
             True if a job was processed, False if queue empty
         """
@@ -293,9 +494,13 @@ class NLPPackWorker:
             logger.warning("run_once called in dry-run mode - use process_segment_direct instead")
             return False
         
-        # Serialize polling to prevent race conditions in concurrent workers
+        # Serialize polling to prevent race conditions in concurrent workers;
+        # one poll claims a batch that the worker threads then share
         with self._poll_lock:
-            job = self.db.poll_next_job()
+            if poll and not self._claimed_jobs:
+                self._claimed_jobs.extend(self.db.poll_next_jobs(batch_size=POLL_BATCH_SIZE))
+            job = self._claimed_jobs.popleft() if self._claimed_jobs else None
+            prefetch = self._prefetched.pop(job['id'], None) if job else None
         
         if not job:
             return False
@@ -303,19 +508,26 @@ class NLPPackWorker:
         job_id = job['id']
         segment_id = job.get('segment_id', 'unknown')
         attempt = job.get('attempt') or 0
+        # claim_pipeline_jobs returns rows already running with this attempt counted
+        already_started = job.get('status') == 'running'
+        if already_started:
+            attempt -= 1
         
         logger.info(f"Processing job_id={job_id}, segment_id={segment_id}")
         
         if attempt >= MAX_RETRIES_PER_JOB:
             logger.warning(f"Job {job_id} exceeded max retries ({MAX_RETRIES_PER_JOB}), marking failed")
-            self.db.set_job_failed(job_id, f"Exceeded max retries ({MAX_RETRIES_PER_JOB})")
+            self._complete_job(job_id, error=f"Exceeded max retries ({MAX_RETRIES_PER_JOB})")
+            if prefetch is not None:
+                prefetch.cancel()
             return True
         
-        self.db.set_job_running(job_id, attempt)
+        if not already_started:
+            self.db.set_job_running(job_id, attempt)
         
         try:
-            output = self.process_job(job)
-            self.db.set_job_success(job_id, output)
+            output = self.process_job(job, self._prefetched_inputs(job_id, prefetch))
+            self._complete_job(job_id, output=output)
             
             skipped_reason = output.get('reason', 'processed')
             stats = output.get('stats', {})
@@ -328,76 +540,111 @@ class NLPPackWorker:
             # Increment completed jobs counter
             with self._jobs_lock:
                 self._jobs_processed += 1
+                collect = GC_EVERY_JOBS > 0 and self._jobs_processed % GC_EVERY_JOBS == 0
+            if collect:
+                release_memory()
         except Exception as e:
-            error_msg = f"{type(e).__name__}: {str(e)}\n{traceback.format_exc()}"
-            logger.error(f"Job {job_id} failed: {error_msg}")
-            self.db.set_job_failed(job_id, error_msg)
+            # Full traceback goes to the log only; the job row keeps the short error
+            error_msg = f"{type(e).__name__}: {e}"
+            logger.exception(f"Job {job_id} failed: {error_msg}")
+            self._complete_job(job_id, error=error_msg)
         
         return True
     
+    def _restart_reason(self) -> Optional[str]:
+        """Why this process should exit for a restart, or None to keep running."""
+        if MAX_JOBS_PER_RESTART and self._jobs_processed >= MAX_JOBS_PER_RESTART:
+            return f"reached max jobs ({MAX_JOBS_PER_RESTART})"
+        if MAX_RSS_MB:
+            rss_mb = current_rss_mb()
+            if rss_mb is not None and rss_mb >= MAX_RSS_MB:
+                return f"resident memory {rss_mb:.0f}MB reached MAX_RSS_MB ({MAX_RSS_MB})"
+        return None
+    
     def run_forever(self):
-        """Run the worker daemon loop with optional concurrency."""
+        """Run NUM_WORKERS persistent worker threads until restart or shutdown."""
         if self.dry_run:
             logger.error("Cannot run daemon in dry-run mode")
             return
+        
+        # Wakes on NOTIFY when available; POLL_SECONDS remains the fallback interval
+        notifier = JobNotifier()
 
-        if NUM_WORKERS <= 1:
-            logger.info(f"Starting NLP Pack Worker daemon (poll every {POLL_SECONDS}s, workers=1, max_jobs={MAX_JOBS_PER_RESTART})")
-            while True:
-                try:
-                    # Check if graceful restart needed
-                    if self._jobs_processed >= MAX_JOBS_PER_RESTART:
-                        logger.info(f"Reached max jobs ({MAX_JOBS_PER_RESTART}), gracefully restarting worker...")
-                        sys.exit(0)  # Exit cleanly, systemd/watchdog will restart
-                    
-                    had_work = self.run_once()
-                    if not had_work:
-                        time.sleep(POLL_SECONDS)
-                except KeyboardInterrupt:
-                    logger.info("Shutting down worker...")
-                    break
-                except Exception as e:
-                    logger.error(f"Unexpected error in main loop: {e}")
-                    time.sleep(POLL_SECONDS)
-            return
+        num_workers = max(1, NUM_WORKERS)
+        logger.info(f"Starting NLP Pack Worker daemon (poll every {POLL_SECONDS}s, workers={num_workers}, max_jobs={MAX_JOBS_PER_RESTART}, max_rss_mb={MAX_RSS_MB})")
+        self.qwen.check_served_model()
 
-        logger.info(f"Starting NLP Pack Worker daemon (poll every {POLL_SECONDS}s, workers={NUM_WORKERS}, max_jobs={MAX_JOBS_PER_RESTART})")
+        # Each thread runs its own poll/process loop so NUM_WORKERS model requests
+        # stay in flight for vLLM's continuous batching; no per-round barrier
+        self._claim_ahead = True
+        threads = [
+            threading.Thread(target=self._worker_loop, name=f"nlp-worker-{i}")
+            for i in range(num_workers)
+        ]
+        for thread in threads:
+            thread.start()
 
-        with ThreadPoolExecutor(max_workers=NUM_WORKERS) as executor:
-            while True:
-                try:
-                    # Check if graceful restart needed
-                    if self._jobs_processed >= MAX_JOBS_PER_RESTART:
-                        logger.info(f"Reached max jobs ({MAX_JOBS_PER_RESTART}), gracefully restarting worker...")
-                        logger.info("Waiting for active threads to complete...")
-                        executor.shutdown(wait=True)  # Wait for all threads to finish
-                        logger.info("All threads completed, exiting for restart")
-                        sys.exit(0)  # Exit cleanly, systemd/watchdog will restart
-                    
-                    futures = [executor.submit(self.run_once) for _ in range(NUM_WORKERS)]
-                    had_work = False
+        restart = None
+        try:
+            # LISTEN connection is single-threaded; this loop relays wake-ups to idle workers
+            while not restart:
+                if notifier.wait(POLL_SECONDS):
+                    self._wake.set()
+                # Notifications cover new jobs, so idle workers only poll as a safety net
+                idle_poll_max = NOTIFY_POLL_SECONDS if notifier.listening else POLL_SECONDS
+                if idle_poll_max < self._idle_poll_max:
+                    self._wake.set()  # Connection lost; return workers to interval polling now
+                self._idle_poll_max = idle_poll_max
+                restart = self._restart_reason()
+        except KeyboardInterrupt:
+            logger.info("Shutting down worker...")
+
+        if restart:
+            logger.info(f"Worker {restart}, gracefully restarting...")
+        self._stop.set()
+        self._wake.set()
+        logger.info("Waiting for active threads to complete...")
+        for thread in threads:
+            thread.join()
+        # A background claim may have landed after the workers exited; finish those jobs too
+        self._prefetch_executor.submit(lambda: None).result()
+        while self.run_once(poll=False):
+            pass
+        self.flush_completions()
+        if self._completions:
+            logger.warning(f"{len(self._completions)} job completions could not be recorded; stale job reset will requeue them")
+        notifier.close()
 
-                    for future in futures:
-                        try:
-                            if future.result():
-                                had_work = True
-                        except Exception as e:
-                            logger.error(f"Worker thread error: {e}")
+        if restart:
+            logger.info("All threads completed, exiting for restart")
+            sys.exit(0)  # Exit cleanly, systemd/watchdog will restart
 
-                    if not had_work:
-                        time.sleep(POLL_SECONDS)
-                except KeyboardInterrupt:
-                    logger.info("Shutting down worker...")
-                    break
-                except Exception as e:
-                    logger.error(f"Unexpected error in main loop: {e}")
-                    time.sleep(POLL_SECONDS)
+    def _worker_loop(self) -> None:
+        """Process jobs until stopped, then finish the jobs this process already claimed."""
+        idle_wait = POLL_SECONDS_MIN
+        while True:
+            stopping = self._stop.is_set() or self._restart_reason() is not None
+            try:
+                had_work = self.run_once(poll=not stopping)
+            except Exception as e:
+                logger.error(f"Worker thread error: {e}")
+                had_work = False
+
+            if had_work:
+                idle_wait = POLL_SECONDS_MIN
+                continue
+            if stopping:
+                return
+            # Back off while the queue stays empty; a job notification wakes immediately
+            if self._wake.wait(idle_wait):
+                idle_wait = POLL_SECONDS_MIN
+            else:
+                idle_wait = min(idle_wait * 2, self._idle_poll_max)
+            self._wake.clear()
 
 
 def run_dry_run(segment_id: str):
     """Run a dry-run for a specific segment."""
-    import json
-    
     logger.info("=" * 60)
     logger.info(f"DRY RUN for segment: {segment_id}")
     logger.info("=" * 60)
@@ -407,42 +654,53 @@ def run_dry_run(segment_id: str):
     try:
         result = worker.process_segment_direct(segment_id)
         
-        print("\n" + "=" * 60)
-        print("DRY RUN RESULTS")
-        print("=" * 60)
-        
         stats = result.get('stats', {})
-        print(f"\nMedia Type: {stats.get('media_type')}")
-        print(f"Segment: {stats.get('segment_type')}-{stats.get('segment_number')}")
-        
-        print(f"\nInput Stats:")
-        print(f"  - Input chars: {stats.get('input_chars', 0):,}")
-        print(f"  - Input tokens (est): {stats.get('input_tokens_est', 0):,}")
+        lines = [
+            "",
+            "=" * 60,
+            "DRY RUN RESULTS",
+            "=" * 60,
+            "",
+            f"Media Type: {stats.get('media_type')}",
+            f"Segment: {stats.get('segment_type')}-{stats.get('segment_number')}",
+            "",
+            "Input Stats:",
+            f"  - Input chars: {stats.get('input_chars', 0):,}",
+            f"  - Input tokens (est): {stats.get('input_tokens_est', 0):,}",
+        ]
         if stats.get('page_count'):
-            print(f"  - Pages: {stats.get('page_count')}")
+            lines.append(f"  - Pages: {stats.get('page_count')}")
         if stats.get('paragraph_count'):
-            print(f"  - Paragraphs: {stats.get('paragraph_count')}")
+            lines.append(f"  - Paragraphs: {stats.get('paragraph_count')}")
         if stats.get('subtitle_blocks'):
-            print(f"  - Subtitle blocks: {stats.get('subtitle_blocks')}")
-        
-        print(f"\nModel Stats:")
-        print(f"  - Output chars: {stats.get('output_chars', 0):,}")
-        print(f"  - Model latency: {stats.get('model_latency_ms', 0):,}ms")
-        print(f"  - Retries: {stats.get('retries_count', 0)}")
+            lines.append(f"  - Subtitle blocks: {stats.get('subtitle_blocks')}")
+        
+        lines += [
+            "",
+            "Model Stats:",
+            f"  - Output chars: {stats.get('output_chars', 0):,}",
+            f"  - Model latency: {stats.get('model_latency_ms', 0):,}ms",
+            f"  - Retries: {stats.get('retries_count', 0)}",
+        ]
         if stats.get('repair_attempted'):
-            print(f"  - Repair attempted: {stats.get('repair_succeeded', False)}")
+            lines.append(f"  - Repair attempted: {stats.get('repair_succeeded', False)}")
         
         if result.get('skipped'):
-            print(f"\nSkipped: {result.get('reason')}")
+            lines += ["", f"Skipped: {result.get('reason')}"]
         else:
-            print(f"\nWould write:")
-            print(f"  - Cleaned text: {result.get('cleaned_bytes', 0):,} bytes")
-            print(f"  - Summary: {'yes' if result.get('summary_upserted') else 'no'}")
-            print(f"  - Entities: {'yes' if result.get('entities_upserted') else 'no'}")
+            lines += [
+                "",
+                "Would write:",
+                f"  - Summary: {'yes' if result.get('summary_upserted') else 'no'}",
+                f"  - Entities: {'yes' if result.get('entities_upserted') else 'no'}",
+            ]
             if result.get('characters'):
-                print(f"  - Characters: {result.get('characters')}")
+                lines.append(f"  - Characters: {result.get('characters')}")
+        
+        lines += ["", "=" * 60]
         
-        print("\n" + "=" * 60)
+        # One write for the whole report
+        sys.stdout.write("\n".join(lines) + "\n")
         
     except Exception as e:
         logger.error(f"Dry run failed: {e}")
@@ -3,6 +3,10 @@
 import os
 import json
 import time
+import logging
+import threading
+import httpx
+from functools import lru_cache
 from typing import Dict, Any, Optional, Tuple
 from openai import OpenAI, APIError, APIConnectionError, APITimeoutError, RateLimitError
 from .schema import (
@@ -11,20 +15,57 @@ from .schema import (
     build_repair_prompt,
     normalize_model_output
 )
-from .utils import get_logger
+from .character_merge import should_process_characters
+from .utils import get_logger, json_loads, json_dumps
 
 logger = get_logger(__name__)
 
 MODEL_TIMEOUT = int(os.environ.get('MODEL_TIMEOUT_SECONDS', '360'))
 MODEL_MAX_RETRIES = int(os.environ.get('MODEL_MAX_RETRIES', '2'))
+# Output token cap per media type; anime/manhwa carry no character_updates. A smaller
+# cap reserves less KV cache per request, so vLLM can batch more sequences at once.
+MAX_OUTPUT_TOKENS = {
+    'novel': int(os.environ.get('MAX_OUTPUT_TOKENS_NOVEL', '10000')),
+    'manhwa': int(os.environ.get('MAX_OUTPUT_TOKENS_MANHWA', '8000')),
+    'anime': int(os.environ.get('MAX_OUTPUT_TOKENS_ANIME', '6000')),
+}
+DEFAULT_MAX_OUTPUT_TOKENS = 16000
+MIN_OUTPUT_TOKENS = 1024  # Floor when a long prompt leaves little room in the context window
+VLLM_MAX_MODEL_LEN = int(os.environ.get('VLLM_MAX_LEN', '32768'))  # Server --max-model-len (same env as serve_model.sh)
+VLLM_MAX_CONNECTIONS = int(os.environ.get('VLLM_MAX_CONNECTIONS', '64'))  # Pooled keep-alive connections to the model server
+VLLM_CONNECT_TIMEOUT = 5.0  # Fail fast on an unreachable server; MODEL_TIMEOUT covers generation
+VLLM_CONCURRENCY = int(os.environ.get('VLLM_CONCURRENCY', '0'))  # Max in-flight model requests per process; 0 = unlimited
+QUANTIZED_MODEL_MARKERS = ('awq', 'gptq', 'fp8', 'int4', 'int8')  # Substrings of quantized checkpoint names
 
 
-def build_system_prompt(media_type: str, work_title: Optional[str] = None) -> str:
-    """Build the system prompt for NLP processing."""
-    work_context = ""
-    if work_title:
-        work_context = f"""\n\n⚠️ WORK: "{work_title}" - Extract ONLY from the text below. NO external knowledge.\n"""
+@lru_cache(maxsize=256)
+def build_system_prompt(
+    media_type: str,
+    work_title: Optional[str] = None,
+    sections: Optional[Tuple[str, ...]] = None
+) -> str:
+    """
+    Build the system prompt for NLP processing (cached per media type and work).
+    
+    The work title goes last so every job of a media type shares the same
+    instruction prefix, which vLLM's prefix cache can reuse across works.
     
+    Args:
+        media_type: 'novel', 'manhwa', or 'anime'
+        work_title: Work name for context isolation
+        sections: Top-level output keys to request; None requests all of them
+    """
+    prompt = _base_system_prompt(media_type)
+    if work_title:
+        prompt += f"""\n\n⚠️ WORK: "{work_title}" - Extract ONLY from the text below. NO external knowledge."""
+    if sections:
+        prompt += f"""\n\n⚠️ OUTPUT ONLY these keys: {', '.join(sections)}. Omit every other key."""
+    return prompt
+
+
+@lru_cache(maxsize=8)
+def _base_system_prompt(media_type: str) -> str:
+    """Instruction block shared by every job of a media type; must stay free of per-job values."""
     char_instruction = ""
     char_example = ""
     if media_type == 'novel':
@@ -63,7 +104,7 @@ def build_system_prompt(media_type: str, work_title: Optional[str] = None) -> st
         char_instruction = "- character_updates: Return empty array [] (not applicable for this media type)"
         char_example = '  "character_updates": []'
 
-    return f"""You are an expert NLP processor for story content analysis. Your task is to process raw text from stories and produce structured analysis output.{work_context}
+    return f"""You are an expert NLP processor for story content analysis. Your task is to process raw text from stories and produce structured analysis output.
 
 TASK: Analyze the provided story text and output a JSON object with the following structure:
 
@@ -102,7 +143,7 @@ CRITICAL RULES:
 - ⚠️ Character names MUST be actual proper nouns from the text. NO "the protagonist", NO generic terms.
 - time_context must be one of: "present", "past", "future", "mixed", "unknown"
 - All segment_entities list fields MUST be arrays (use [] if empty).
-- OUTPUT ONLY VALID JSON."""
+- OUTPUT ONLY VALID JSON, minified on a single line (no indentation or line breaks)."""
 
 
 def build_user_prompt(source_text: str, media_type: str, work_title: Optional[str] = None) -> str:
@@ -126,13 +167,57 @@ class QwenClient:
         self.timeout = MODEL_TIMEOUT
         self.max_retries = MODEL_MAX_RETRIES
         
+        # Keep connections warm across the gap between a worker's requests (httpx's
+        # default 5s keep-alive expires while a job is being written back)
+        self.http_client = httpx.Client(
+            limits=httpx.Limits(
+                max_connections=VLLM_MAX_CONNECTIONS,
+                max_keepalive_connections=VLLM_MAX_CONNECTIONS,
+                keepalive_expiry=60.0
+            )
+        )
         self.client = OpenAI(
             base_url=self.base_url,
             api_key=self.api_key,
-            timeout=self.timeout
+            timeout=httpx.Timeout(self.timeout, connect=VLLM_CONNECT_TIMEOUT),
+            http_client=self.http_client
         )
+        # Lets NUM_WORKERS exceed the server's batch target: extra threads do I/O while
+        # at most VLLM_CONCURRENCY requests are in flight
+        self._request_slots = threading.BoundedSemaphore(VLLM_CONCURRENCY) if VLLM_CONCURRENCY > 0 else None
         logger.info(f"QwenClient initialized with model: {self.model}, timeout: {self.timeout}s")
     
+    def check_served_model(self) -> None:
+        """Warn if the server doesn't list our model or it isn't a quantized checkpoint.
+        
+        A startup check for the daemon; not run from the constructor so one-shot
+        and dry-run clients don't pay for the /v1/models round trip.
+        """
+        try:
+            models = self.client.with_options(timeout=10, max_retries=0).models.list().data
+        except Exception as e:
+            logger.warning(f"Could not list served models: {e}")
+            return
+        
+        model = next((m for m in models if m.id == self.model), None)
+        if model is None:
+            logger.warning(f"Model {self.model} not served by {self.base_url} (available: {[m.id for m in models]})")
+            return
+        
+        # vLLM reports the loaded checkpoint (e.g. Qwen/Qwen2.5-7B-Instruct-AWQ) as root
+        root = getattr(model, 'root', None) or model.id
+        if any(marker in root.lower() for marker in QUANTIZED_MODEL_MARKERS):
+            logger.info(f"Served model {self.model} loads {root}")
+        else:
+            logger.warning(f"Served model {self.model} loads {root}, which does not look quantized (AWQ/GPTQ/FP8)")
+    
+    def _create_completion(self, **kwargs):
+        """Send one chat completion, waiting for a request slot if VLLM_CONCURRENCY is set."""
+        if self._request_slots is None:
+            return self.client.chat.completions.create(**kwargs)
+        with self._request_slots:
+            return self.client.chat.completions.create(**kwargs)
+    
     def _should_retry(self, error: Exception) -> bool:
         """Determine if an error should trigger a retry."""
         if isinstance(error, (APIConnectionError, APITimeoutError)):
@@ -149,12 +234,12 @@ class QwenClient:
         messages: list,
         max_tokens: int,
         temperature: float
-    ) -> Tuple[Optional[str], float, int]:
+    ) -> Tuple[Optional[str], float, int, Optional[int]]:
         """
         Call the model with retry logic.
         
         Returns:
-            (response_content, latency_ms, retry_count)
+            (response_content, latency_ms, retry_count, completion_tokens)
         """
         guided_json = get_vllm_guided_json_schema()
         retry_count = 0
@@ -163,13 +248,15 @@ class QwenClient:
         for attempt in range(self.max_retries + 1):
             start_time = time.time()
             try:
-                response = self.client.chat.completions.create(
+                response = self._create_completion(
                     model=self.model,
                     messages=messages,
                     max_tokens=max_tokens,
                     temperature=temperature,
                     response_format={"type": "json_object"},
-                    # Disable KV cache reuse to prevent cross-contamination
+                    # vLLM defaults, stated explicitly. Server prefix caching only reuses KV
+                    # blocks whose entire preceding token sequence is identical, so no text
+                    # from one job's prompt can reach another's
                     extra_body={
                         "use_beam_search": False,
                         "ignore_eos": False
@@ -182,8 +269,12 @@ class QwenClient:
                 )
                 
                 latency_ms = (time.time() - start_time) * 1000
-                content = response.choices[0].message.content
-                return content, latency_ms, retry_count
+                choice = response.choices[0]
+                if choice.finish_reason == 'length':
+                    logger.warning(f"Model output hit max_tokens ({max_tokens}); JSON is likely truncated")
+                content = choice.message.content
+                usage = getattr(response, 'usage', None)
+                return content, latency_ms, retry_count, getattr(usage, 'completion_tokens', None)
                 
             except Exception as e:
                 last_error = e
@@ -212,7 +303,7 @@ class QwenClient:
         logger.info("Attempting JSON repair with model...")
         
         try:
-            response = self.client.chat.completions.create(
+            response = self._create_completion(
                 model=self.model,
                 messages=[
                     {"role": "system", "content": "You are a JSON repair assistant. Fix the invalid JSON to match the schema."},
@@ -231,8 +322,9 @@ class QwenClient:
         source_text: str, 
         media_type: str,
         work_title: Optional[str] = None,
-        max_tokens: int = 16000,
-        temperature: float = 0.3
+        max_tokens: Optional[int] = None,
+        temperature: float = 0.3,
+        sections: Optional[Tuple[str, ...]] = None
     ) -> Tuple[Optional[Dict[str, Any]], Dict[str, Any]]:
         """
         Process source text through Qwen model with structured output.
@@ -240,14 +332,18 @@ class QwenClient:
         Args:
             source_text: The text to analyze
             media_type: 'novel', 'manhwa', or 'anime'
-            max_tokens: Maximum tokens in response
+            max_tokens: Maximum tokens in response (defaults to MAX_OUTPUT_TOKENS for the media type)
             temperature: Sampling temperature
+            sections: Only generate these top-level keys (others come back empty); None for all
         
         Returns:
             (normalized_output, stats_dict)
             normalized_output is None if processing failed
             stats_dict contains metrics for logging
         """
+        if max_tokens is None:
+            max_tokens = MAX_OUTPUT_TOKENS.get(media_type, DEFAULT_MAX_OUTPUT_TOKENS)
+        
         stats = {
             'input_chars': len(source_text),
             'input_tokens_est': len(source_text) // 4,
@@ -258,7 +354,8 @@ class QwenClient:
             'repair_succeeded': False
         }
         
-        system_prompt = build_system_prompt(media_type, work_title)
+        system_prompt = build_system_prompt(media_type, work_title, sections)
+        require_summary = sections is None or 'segment_summary' in sections
         user_prompt = build_user_prompt(source_text, media_type, work_title)
         
         messages = [
@@ -266,32 +363,37 @@ class QwenClient:
             {"role": "user", "content": user_prompt}
         ]
         
+        # vLLM rejects prompt + max_tokens beyond the context window, and reserves KV
+        # cache for the whole budget; ~3 chars/token errs toward a smaller budget
+        prompt_tokens_est = (len(system_prompt) + len(user_prompt)) // 3
+        if prompt_tokens_est + max_tokens > VLLM_MAX_MODEL_LEN:
+            max_tokens = max(MIN_OUTPUT_TOKENS, VLLM_MAX_MODEL_LEN - prompt_tokens_est)
+            logger.info(f"Long prompt (~{prompt_tokens_est} tokens), max_tokens reduced to {max_tokens}")
+        stats['max_tokens'] = max_tokens
+        
         logger.info(f"Sending {stats['input_chars']} chars ({stats['input_tokens_est']} est tokens) to model for {media_type}")
         
         try:
-            content, latency_ms, retry_count = self._call_model(messages, max_tokens, temperature)
+            content, latency_ms, retry_count, output_tokens = self._call_model(messages, max_tokens, temperature)
             stats['model_latency_ms'] = int(latency_ms)
             stats['retries_count'] = retry_count
             stats['output_chars'] = len(content) if content else 0
+            stats['output_tokens'] = output_tokens
             
         except Exception as e:
             logger.error(f"Model API call failed: {e}")
             return None, stats
         
         try:
-            result = json.loads(content)
-            logger.debug(f"Parsed JSON keys: {list(result.keys())}")
-            if 'character_updates' in result:
-                char_updates = result.get('character_updates')
-                logger.debug(f"character_updates type: {type(char_updates)}, value: {char_updates}")
-                if isinstance(char_updates, list) and char_updates:
-                    logger.debug(f"First item type: {type(char_updates[0])}, value: {char_updates[0]}")
-            logger.debug(f"Parsed JSON keys: {list(result.keys())}")
-            if 'character_updates' in result:
-                char_updates = result.get('character_updates')
-                logger.debug(f"character_updates type: {type(char_updates)}, value: {char_updates}")
-                if isinstance(char_updates, list) and char_updates:
-                    logger.debug(f"First item type: {type(char_updates[0])}, value: {char_updates[0]}")
+            result = json_loads(content)
+            # f-strings format eagerly; skip repr of a large response unless debugging
+            if logger.isEnabledFor(logging.DEBUG) and isinstance(result, dict):
+                logger.debug(f"Parsed JSON keys: {list(result.keys())}")
+                if 'character_updates' in result:
+                    char_updates = result.get('character_updates')
+                    logger.debug(f"character_updates type: {type(char_updates)}, value: {char_updates}")
+                    if isinstance(char_updates, list) and char_updates:
+                        logger.debug(f"First item type: {type(char_updates[0])}, value: {char_updates[0]}")
         except json.JSONDecodeError as e:
             logger.warning(f"Failed to parse model response as JSON: {e}")
             logger.warning(f"Raw response content (first 1000 chars): {content[:1000]!r}")
@@ -300,7 +402,7 @@ class QwenClient:
             repaired = self._repair_json(content, str(e), max_tokens)
             if repaired:
                 try:
-                    result = json.loads(repaired)
+                    result = json_loads(repaired)
                     stats['repair_succeeded'] = True
                     logger.info("JSON repair succeeded")
                 except json.JSONDecodeError:
@@ -309,17 +411,23 @@ class QwenClient:
             else:
                 return None, stats
         
-        is_valid, normalized, error = validate_and_normalize(result)
+        # Non-novel output never feeds character updates; don't validate them
+        if isinstance(result, dict) and not should_process_characters(media_type):
+            result.pop('character_updates', None)
+        
+        is_valid, normalized, error = validate_and_normalize(result, require_summary)
         
         if not is_valid:
             logger.warning(f"Validation issue: {error}")
             stats['repair_attempted'] = True
             
-            repaired = self._repair_json(json.dumps(result), error, max_tokens)
+            repaired = self._repair_json(json_dumps(result), error, max_tokens)
             if repaired:
                 try:
-                    repaired_result = json.loads(repaired)
-                    is_valid2, normalized, error2 = validate_and_normalize(repaired_result)
+                    repaired_result = json_loads(repaired)
+                    if isinstance(repaired_result, dict) and not should_process_characters(media_type):
+                        repaired_result.pop('character_updates', None)
+                    is_valid2, normalized, error2 = validate_and_normalize(repaired_result, require_summary)
                     if is_valid2:
                         stats['repair_succeeded'] = True
                         logger.info("Schema repair succeeded")
@@ -335,10 +443,13 @@ class QwenClient:
 
 
 _qwen_client: Optional[QwenClient] = None
+_qwen_client_lock = threading.Lock()
 
 def get_qwen_client() -> QwenClient:
     """Get singleton QwenClient instance."""
     global _qwen_client
     if _qwen_client is None:
-        _qwen_client = QwenClient()
+        with _qwen_client_lock:
+            if _qwen_client is None:
+                _qwen_client = QwenClient()
     return _qwen_client
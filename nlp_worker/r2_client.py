@@ -2,11 +2,13 @@
 
 import os
 import time
+import threading
 import boto3
 import httpx
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from botocore.config import Config
 from botocore.exceptions import ClientError, ConnectionError, EndpointConnectionError
-from typing import Optional, Dict, Any
+from typing import Optional, Dict, Any, List, Iterator, Tuple, Union
 from .utils import get_logger, sha256_hash
 
 logger = get_logger(__name__)
@@ -14,6 +16,7 @@ logger = get_logger(__name__)
 R2_MAX_RETRIES = int(os.environ.get('R2_MAX_RETRIES', '3'))
 R2_RETRY_DELAY = float(os.environ.get('R2_RETRY_DELAY', '1.0'))
 R2_CUSTOM_DOMAIN = os.environ.get('R2_CUSTOM_DOMAIN', 'https://assets.chapterbridge.com')
+R2_DOWNLOAD_WORKERS = int(os.environ.get('R2_DOWNLOAD_WORKERS', '16'))
 
 
 class R2Client:
@@ -36,7 +39,20 @@ class R2Client:
         self.http_client = httpx.Client(
             timeout=httpx.Timeout(30.0, connect=10.0),
             follow_redirects=True,
-            http2=False
+            http2=False,
+            # Sized so every shared download thread keeps a warm connection
+            limits=httpx.Limits(
+                max_connections=max(50, R2_DOWNLOAD_WORKERS * 2),
+                max_keepalive_connections=max(32, R2_DOWNLOAD_WORKERS),
+                keepalive_expiry=30.0
+            )
+        )
+        
+        # Shared by all worker threads so total download concurrency stays at
+        # R2_DOWNLOAD_WORKERS and threads are reused across segments
+        self._download_executor = ThreadPoolExecutor(
+            max_workers=R2_DOWNLOAD_WORKERS,
+            thread_name_prefix='r2-download'
         )
         
         # boto3 client for uploads only (S3 API required)
@@ -48,6 +64,7 @@ class R2Client:
             config=Config(
                 signature_version='s3v4',
                 retries={'max_attempts': 0},
+                tcp_keepalive=True,  # Keep pooled upload connections alive across long model calls
                 connect_timeout=30,
                 read_timeout=60
             )
@@ -138,6 +155,39 @@ class R2Client:
             return None
         return data.decode(encoding)
     
+    def iter_downloads(self, keys: List[str]) -> Iterator[Tuple[int, bytes]]:
+        """
+        Download several files concurrently, yielding each as soon as it arrives.
+        
+        Args:
+            keys: The R2 keys to download
+        
+        Yields:
+            (index into keys, file bytes) in completion order
+        """
+        if len(keys) <= 1:
+            for i, key in enumerate(keys):
+                yield i, self.download(key)
+            return
+        
+        futures = {
+            self._download_executor.submit(self.download, key): i
+            for i, key in enumerate(keys)
+        }
+        try:
+            for future in as_completed(futures):
+                # Drop our reference so each page's bytes are freed once the caller parses it,
+                # instead of every downloaded page staying alive until the last one arrives
+                i = futures.pop(future)
+                data = future.result()
+                del future
+                yield i, data
+                del data
+        finally:
+            # Don't leave queued downloads behind if a page failed or the caller stopped early
+            for future in futures:
+                future.cancel()
+    
     def upload(
         self, 
         key: str, 
@@ -170,11 +220,12 @@ class R2Client:
     def upload_text(
         self, 
         key: str, 
-        text: str, 
+        text: Union[str, bytes], 
         encoding: str = 'utf-8'
     ) -> Dict[str, Any]:
-        """Upload a text file to R2."""
-        return self.upload(key, text.encode(encoding), 'text/plain; charset=utf-8')
+        """Upload a text file to R2 (pass already-encoded bytes to skip re-encoding)."""
+        data = text if isinstance(text, bytes) else text.encode(encoding)
+        return self.upload(key, data, f'text/plain; charset={encoding}')
     
     def exists(self, key: str) -> bool:
         """Check if a key exists in R2 via custom domain."""
@@ -200,10 +251,13 @@ class R2Client:
 
 
 _r2_client: Optional[R2Client] = None
+_r2_client_lock = threading.Lock()
 
 def get_r2_client() -> R2Client:
     """Get singleton R2 client instance."""
     global _r2_client
     if _r2_client is None:
-        _r2_client = R2Client()
+        with _r2_client_lock:
+            if _r2_client is None:
+                _r2_client = R2Client()
     return _r2_client
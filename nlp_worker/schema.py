@@ -4,10 +4,21 @@ import json
 import re
 from typing import Dict, Any, Optional, List
 from pydantic import BaseModel, Field, field_validator, model_validator
-from .utils import get_logger
+from .utils import get_logger, json_loads
 
 logger = get_logger(__name__)
 
+# Generic terms the model sometimes emits instead of a real character name
+INVALID_CHARACTER_NAMES = frozenset({
+    'ayah', 'ibu', 'bapak', 'kakak', 'adik', 'anak', 'orang tua',
+    'pria', 'wanita', 'laki-laki', 'perempuan', 'orang',
+    'orang kekar', 'pria berbaju', 'wanita muda', 'pemuda',
+    'anak laki-laki', 'anak perempuan', 'gadis', 'bocah',
+    'he', 'she', 'they', 'person', 'man', 'woman', 'boy', 'girl',
+    'father', 'mother', 'brother', 'sister', 'parent', 'child',
+    'unknown', 'unnamed', 'none', 'n/a'
+})
+
 
 class SegmentSummaryModel(BaseModel):
     """Segment summary model - simplified structure."""
@@ -71,20 +82,9 @@ class CharacterUpdateModel(BaseModel):
             return ""
         
         v = v.strip()
-        lower_v = v.lower()
         
         # Filter out generic/invalid names
-        invalid_names = [
-            'ayah', 'ibu', 'bapak', 'kakak', 'adik', 'anak', 'orang tua',
-            'pria', 'wanita', 'laki-laki', 'perempuan', 'orang',
-            'orang kekar', 'pria berbaju', 'wanita muda', 'pemuda',
-            'anak laki-laki', 'anak perempuan', 'gadis', 'bocah',
-            'he', 'she', 'they', 'person', 'man', 'woman', 'boy', 'girl',
-            'father', 'mother', 'brother', 'sister', 'parent', 'child',
-            'unknown', 'unnamed', 'none', 'n/a'
-        ]
-        
-        if lower_v in invalid_names:
+        if v.lower() in INVALID_CHARACTER_NAMES:
             return ""
         
         # Must have at least 2 characters and not be all numbers
@@ -158,10 +158,17 @@ def normalize_model_output(raw_output: Dict[str, Any]) -> Dict[str, Any]:
         return NLPOutputModel().model_dump()
 
 
-def validate_and_normalize(raw_output: Dict[str, Any]) -> tuple[bool, Dict[str, Any], Optional[str]]:
+def validate_and_normalize(
+    raw_output: Dict[str, Any],
+    require_summary: bool = True
+) -> tuple[bool, Dict[str, Any], Optional[str]]:
     """
     Validate and normalize model output.
     
+    Args:
+        raw_output: Parsed model output
+        require_summary: False when the summary wasn't requested (partial rebuild)
+    
     Returns:
         (is_valid, normalized_output, error_message)
     """
@@ -169,7 +176,7 @@ def validate_and_normalize(raw_output: Dict[str, Any]) -> tuple[bool, Dict[str,
         model = NLPOutputModel.model_validate(raw_output)
         normalized = model.model_dump()
         
-        if not normalized.get('segment_summary', {}).get('summary'):
+        if require_summary and not normalized.get('segment_summary', {}).get('summary'):
             return False, normalized, "summary is empty"
         
         return True, normalized, None
@@ -240,7 +247,7 @@ def parse_model_response(response_text: str) -> Optional[Dict[str, Any]]:
         Normalized dict if valid, None if parsing fails
     """
     try:
-        data = json.loads(response_text)
+        data = json_loads(response_text)
         is_valid, normalized, error = validate_and_normalize(data)
         
         if not is_valid:
@@ -2,14 +2,20 @@
 
 import os
 import time
+import threading
+from collections import OrderedDict
 from datetime import datetime
-from typing import Optional, List, Dict, Any
+from typing import Optional, List, Dict, Any, Tuple
 from supabase import create_client, Client
 import httpx
 from .utils import get_logger
 
 logger = get_logger(__name__)
 
+METADATA_CACHE_TTL = float(os.environ.get('METADATA_CACHE_TTL_SECONDS', '60'))  # Segment rows; characters are never cached
+WORK_TITLE_CACHE_TTL = float(os.environ.get('WORK_TITLE_CACHE_TTL_SECONDS', '300'))  # Titles rarely change
+METADATA_CACHE_MAX = 1024  # Entries kept before least recently used are evicted
+
 class SupabaseClient:
     """Client for interacting with Supabase database."""
     
@@ -24,7 +30,7 @@ class SupabaseClient:
         # This prevents connection pool exhaustion and stale connections
         http_client = httpx.Client(
             timeout=httpx.Timeout(30.0, connect=10.0),  # 30s timeout, 10s connect
-            limits=httpx.Limits(max_connections=10, max_keepalive_connections=5),
+            limits=httpx.Limits(max_connections=10, max_keepalive_connections=10, keepalive_expiry=30.0),
             http2=False  # Force HTTP/1.1 to avoid HTTP/2 connection issues
         )
         
@@ -34,8 +40,36 @@ class SupabaseClient:
         self.client.postgrest.session = http_client
         
         self.max_retries = max_retries
+        self._claim_rpc_available = True  # Cleared if claim_pipeline_jobs is not deployed
+        self._complete_rpc_available = True  # Cleared if complete_pipeline_jobs is not deployed
+        self._status_rpc_available = True  # Cleared if get_segment_and_output_status is not deployed
+        self._exists_rpc_available = True  # Cleared if check_nlp_outputs_exist is not deployed
+        self._upsert_outputs_rpc_available = True  # Cleared if upsert_segment_nlp_outputs is not deployed
+        
+        # Short-lived cache for per-job metadata reads shared by all worker threads
+        self._cache: OrderedDict = OrderedDict()  # LRU of key -> (fetched_at, value)
+        self._cache_lock = threading.Lock()
+        
         logger.info("Supabase client initialized with connection limits")
     
+    def _cached(self, key: tuple, fetch, ttl: float = METADATA_CACHE_TTL) -> Any:
+        """Return a cached value younger than ttl seconds, else fetch and store it."""
+        now = time.monotonic()
+        with self._cache_lock:
+            entry = self._cache.get(key)
+            if entry and now - entry[0] < ttl:
+                self._cache.move_to_end(key)
+                return entry[1]
+        
+        value = fetch()
+        if value is not None:
+            with self._cache_lock:
+                self._cache[key] = (now, value)
+                self._cache.move_to_end(key)
+                while len(self._cache) > METADATA_CACHE_MAX:
+                    self._cache.popitem(last=False)
+        return value
+    
     def _execute_with_retry(self, func, *args, **kwargs):
         """Execute a function with retry logic for connection errors."""
         last_error = None
@@ -101,6 +135,58 @@ class SupabaseClient:
             logger.error(f"Failed to poll jobs: {e}")
             raise
     
+    def poll_next_jobs(
+        self,
+        batch_size: int = 1,
+        job_type: str = 'summarize',
+        task: str = 'nlp_pack_v1'
+    ) -> List[Dict]:
+        """
+        Claim up to batch_size queued jobs in one round trip.
+        
+        Uses the claim_pipeline_jobs RPC, which marks the jobs running in the same
+        statement that locks them. Without it, selects a batch of queued jobs and
+        claims each with a conditional update (only rows still queued are returned).
+        """
+        if self._claim_rpc_available:
+            try:
+                result = self.client.rpc('claim_pipeline_jobs', {
+                    'p_job_type': job_type,
+                    'p_task': task,
+                    'p_batch_size': batch_size
+                }).execute()
+                return result.data or []
+            except Exception as e:
+                if getattr(e, 'code', None) == 'PGRST202':
+                    # Function not deployed; stop paying a failed round trip per poll
+                    self._claim_rpc_available = False
+                logger.debug(f"RPC claim_pipeline_jobs not available: {e}")
+        
+        if batch_size <= 1:
+            job = self.poll_next_job(job_type, task)
+            return [job] if job else []
+        
+        result = self.client.table('pipeline_jobs') \
+            .select('id, attempt') \
+            .eq('status', 'queued') \
+            .eq('job_type', job_type) \
+            .filter('input->>task', 'eq', task) \
+            .order('created_at', desc=False) \
+            .limit(batch_size) \
+            .execute()
+        
+        claimed = []
+        for row in result.data or []:
+            # Same shape as the RPC: running, with this attempt already counted
+            update = self.client.table('pipeline_jobs').update({
+                'status': 'running',
+                'started_at': datetime.utcnow().isoformat(),
+                'attempt': (row.get('attempt') or 0) + 1
+            }).eq('id', row['id']).eq('status', 'queued').execute()
+            if update.data:
+                claimed.append(update.data[0])
+        return claimed
+    
     def set_job_running(self, job_id: str, attempt: int) -> None:
         """Mark a job as running."""
         self.client.table('pipeline_jobs').update({
@@ -128,6 +214,54 @@ class SupabaseClient:
         }).eq('id', job_id).execute()
         logger.error(f"Job {job_id} failed: {error}")
     
+    def complete_jobs(self, completions: List[Dict]) -> List[Dict]:
+        """
+        Record several job completions at once.
+        
+        Uses the complete_pipeline_jobs RPC, falling back to one
+        set_job_success / set_job_failed call per job only if it is not deployed
+        (PGRST202); other RPC errors are raised for the caller to retry.
+        
+        Args:
+            completions: Dicts with id, finished_at and either output (success) or error (failed)
+        
+        Returns:
+            The completions that could not be recorded by the per-job fallback
+        """
+        if not completions:
+            return []
+        
+        if self._complete_rpc_available:
+            try:
+                self._execute_with_retry(
+                    lambda: self.client.rpc('complete_pipeline_jobs', {'p_jobs': completions}).execute()
+                )
+                for c in completions:
+                    if c.get('error') is None:
+                        logger.info(f"Job {c['id']} completed successfully")
+                    else:
+                        logger.error(f"Job {c['id']} failed: {c['error']}")
+                return []
+            except Exception as e:
+                # Other errors may come after the RPC committed; let the caller retry it
+                if getattr(e, 'code', None) != 'PGRST202':
+                    raise
+                # Function not deployed; stop paying a failed round trip per flush
+                self._complete_rpc_available = False
+                logger.debug(f"RPC complete_pipeline_jobs not available: {e}")
+        
+        failed = []
+        for c in completions:
+            try:
+                if c.get('error') is None:
+                    self.set_job_success(c['id'], c.get('output'))
+                else:
+                    self.set_job_failed(c['id'], c['error'])
+            except Exception as e:
+                logger.error(f"Failed to record completion for job {c['id']}: {e}")
+                failed.append(c)
+        return failed
+    
     def get_segment_with_edition(self, segment_id: str) -> Optional[Dict]:
         """Get segment with edition info."""
         def _fetch():
@@ -138,7 +272,58 @@ class SupabaseClient:
                 .execute()
             return result.data[0] if result.data and len(result.data) > 0 else None
         
-        return self._execute_with_retry(_fetch)
+        return self._cached(
+            ('segment_with_edition', segment_id),
+            lambda: self._execute_with_retry(_fetch)
+        )
+    
+    def get_segment_and_output_status(self, segment_id: str) -> Tuple[Optional[Dict], Dict[str, bool]]:
+        """
+        Get segment with edition info plus which NLP outputs already exist.
+        
+        Uses the get_segment_and_output_status RPC (one round trip), falling back
+        to get_segment_with_edition + check_outputs_exist if it is not deployed.
+        
+        Returns:
+            (segment shaped like get_segment_with_edition or None, existing outputs dict)
+        """
+        result = None
+        if self._status_rpc_available:
+            try:
+                result = self._execute_with_retry(
+                    lambda: self.client.rpc('get_segment_and_output_status', {'p_segment_id': segment_id}).execute()
+                )
+            except Exception as e:
+                if getattr(e, 'code', None) != 'PGRST202':
+                    raise
+                # Function not deployed; stop paying a failed round trip per job
+                self._status_rpc_available = False
+                logger.debug(f"RPC get_segment_and_output_status not available: {e}")
+        if result is not None:
+            if not result.data:
+                return None, {}
+            row = result.data[0]
+            segment = {
+                'id': row['segment_id'],
+                'edition_id': row['edition_id'],
+                'segment_type': row['segment_type'],
+                'number': row['number'],
+                'title': row.get('title'),
+                'editions': {
+                    'id': row['edition_id'],
+                    'work_id': row['work_id'],
+                    'media_type': row['media_type']
+                }
+            }
+            return segment, {
+                'segment_summaries': bool(row['summary_exists']),
+                'segment_entities': bool(row['entities_exists'])
+            }
+        
+        segment = self.get_segment_with_edition(segment_id)
+        if not segment:
+            return None, {}
+        return segment, self.check_outputs_exist(segment_id)
     
     def get_work_title(self, work_id: str) -> Optional[str]:
         """Get work title by ID."""
@@ -150,7 +335,11 @@ class SupabaseClient:
                 .execute()
             return result.data[0].get('title') if result.data and len(result.data) > 0 else None
         
-        return self._execute_with_retry(_fetch)
+        return self._cached(
+            ('work_title', work_id),
+            lambda: self._execute_with_retry(_fetch),
+            ttl=WORK_TITLE_CACHE_TTL
+        )
     
     def get_segment_assets(self, segment_id: str, asset_type: str) -> List[Dict]:
         """Get assets linked to a segment by type."""
@@ -215,6 +404,40 @@ class SupabaseClient:
         
         return result.data[0] if result.data else None
     
+    def check_outputs_exist(self, segment_id: str) -> Dict[str, bool]:
+        """
+        Check which NLP outputs exist for a segment.
+        
+        Uses the check_nlp_outputs_exist RPC (one round trip), falling back to
+        two existence queries if it is not deployed.
+        """
+        result = None
+        if self._exists_rpc_available:
+            try:
+                result = self.client.rpc('check_nlp_outputs_exist', {'p_segment_id': segment_id}).execute()
+            except Exception as e:
+                if getattr(e, 'code', None) != 'PGRST202':
+                    raise
+                # Function not deployed; stop paying a failed round trip per job
+                self._exists_rpc_available = False
+                logger.debug(f"RPC check_nlp_outputs_exist not available: {e}")
+        if result is not None and result.data:
+            row = result.data[0]
+            return {
+                'segment_summaries': bool(row.get('summary_exists')),
+                'segment_entities': bool(row.get('entities_exists'))
+            }
+        
+        existing = {}
+        for table in ('segment_summaries', 'segment_entities'):
+            result = self.client.table(table) \
+                .select('segment_id') \
+                .eq('segment_id', segment_id) \
+                .limit(1) \
+                .execute()
+            existing[table] = bool(result.data)
+        return existing
+    
     def upsert_segment_summary(
         self,
         segment_id: str,
@@ -272,8 +495,69 @@ class SupabaseClient:
         logger.info(f"Upserted segment_entities for {segment_id}")
         return result.data[0] if result.data else None
     
+    def upsert_segment_outputs(
+        self,
+        segment_id: str,
+        edition_id: str,
+        model_version: str,
+        summary: Optional[Dict] = None,
+        entities: Optional[Dict] = None
+    ) -> None:
+        """
+        Upsert summary and/or entities for a segment (None skips that output).
+        
+        Uses the upsert_segment_nlp_outputs RPC (one round trip, one transaction),
+        falling back to upsert_segment_summary + upsert_segment_entities.
+        """
+        if summary is None and entities is None:
+            return
+        
+        if self._upsert_outputs_rpc_available:
+            try:
+                self._execute_with_retry(
+                    lambda: self.client.rpc('upsert_segment_nlp_outputs', {
+                        'p_segment_id': segment_id,
+                        'p_edition_id': edition_id,
+                        'p_model_version': model_version,
+                        'p_summary': summary,
+                        'p_entities': entities
+                    }).execute()
+                )
+                logger.info(f"Upserted NLP outputs for {segment_id} (summary={summary is not None}, entities={entities is not None})")
+                return
+            except Exception as e:
+                # Only a missing function falls back: after any other error the
+                # transaction state is unknown and two separate writes could
+                # leave the segment half-written
+                if getattr(e, 'code', None) != 'PGRST202':
+                    raise
+                self._upsert_outputs_rpc_available = False
+                logger.debug(f"RPC upsert_segment_nlp_outputs not available: {e}")
+        
+        if summary is not None:
+            self.upsert_segment_summary(
+                segment_id=segment_id,
+                edition_id=edition_id,
+                summary=summary.get('summary', ''),
+                summary_short=summary.get('summary_short', ''),
+                events=summary.get('events', []),
+                model_version=model_version
+            )
+        if entities is not None:
+            self.upsert_segment_entities(
+                segment_id=segment_id,
+                edition_id=edition_id,
+                entities=entities,
+                model_version=model_version
+            )
+    
     def get_work_characters(self, work_id: str) -> List[Dict]:
-        """Get all characters for a work."""
+        """
+        Get all characters for a work.
+        
+        Always read fresh, never cached: the merge rewrites whole character_facts
+        lists, so a stale read would overwrite facts another worker just stored.
+        """
         result = self.client.table('characters') \
             .select('*') \
             .eq('work_id', work_id) \
@@ -341,15 +625,53 @@ class SupabaseClient:
         
         return None
     
-    def update_character(self, char_id: str, updates: Dict) -> None:
-        """Update an existing character."""
-        self.client.table('characters').update(updates).eq('id', char_id).execute()
-    
-    def get_segments_missing_nlp(self) -> List[Dict]:
-        """Get segments that are missing NLP processing."""
-        result = self.client.rpc('get_segments_missing_nlp').execute()
-        return result.data if result.data else []
-    
+    def update_characters_batch(self, rows: List[Dict]) -> None:
+        """
+        Update several existing characters in a single request.
+
+        Each row must carry 'id' plus the NOT NULL columns (work_id, name) so the
+        bulk upsert on the primary key resolves to an update of that row.
+        """
+        if not rows:
+            return
+
+        self.client.table('characters').upsert(rows, on_conflict='id').execute()
+        logger.info(f"Batch updated {len(rows)} characters")
+
+    def insert_characters_batch(self, rows: List[Dict]) -> List[Dict]:
+        """
+        Insert several new characters in a single request.
+
+        Falls back to per-row upsert_character if another worker inserted one of
+        the names first (unique index on work_id, LOWER(name)).
+        """
+        if not rows:
+            return []
+
+        from postgrest.exceptions import APIError
+
+        try:
+            result = self.client.table('characters').insert(rows).execute()
+            logger.info(f"Batch inserted {len(rows)} characters")
+            return result.data or []
+        except APIError as e:
+            if e.code != '23505':
+                raise
+            logger.warning(f"Duplicate key in batch insert of {len(rows)} characters, falling back to per-row upsert")
+
+        inserted = []
+        for row in rows:
+            new_char = self.upsert_character(
+                work_id=row['work_id'],
+                name=row['name'],
+                character_facts=row['character_facts'],
+                description=row.get('description', ''),
+                model_version=row['model_version']
+            )
+            if new_char:
+                inserted.append(new_char)
+        return inserted
+
     def enqueue_nlp_job(self, segment_id: str, force: bool = False) -> Dict:
         """Enqueue an NLP pack job for a segment."""
         # Get segment with edition and work info
@@ -373,6 +695,60 @@ class SupabaseClient:
         
         return result.data[0] if result.data else None
     
+    def enqueue_nlp_jobs_bulk(
+        self,
+        segments: List[Dict],
+        force: bool = False,
+        chunk_size: int = 500
+    ) -> int:
+        """
+        Enqueue NLP pack jobs for many segments with one insert per chunk.
+        
+        Args:
+            segments: Rows with segment_id, edition_id and work_id
+                (as returned by enqueue.get_segments_missing_nlp)
+            force: Force reprocessing even if outputs exist
+            chunk_size: Maximum rows per insert request
+        
+        Returns:
+            Number of jobs inserted (segments that already have an active job
+            are skipped when the pipeline_jobs_active_per_segment index exists)
+        """
+        from postgrest.exceptions import APIError
+        
+        rows = [{
+            'job_type': 'summarize',
+            'segment_id': seg['segment_id'],
+            'edition_id': seg['edition_id'],
+            'work_id': seg['work_id'],
+            'input': {'task': 'nlp_pack_v1', 'force': force},
+            'status': 'queued'
+        } for seg in segments]
+        
+        inserted = 0
+        for i in range(0, len(rows), chunk_size):
+            chunk = rows[i:i + chunk_size]
+            try:
+                result = self.client.table('pipeline_jobs').insert(chunk).execute()
+                inserted += len(result.data) if result.data else 0
+                continue
+            except APIError as e:
+                if e.code != '23505':
+                    raise
+                logger.warning(f"Active job conflict in batch of {len(chunk)}, inserting rows individually")
+            
+            # Another enqueuer raced us; insert one by one and skip the conflicts
+            for row in chunk:
+                try:
+                    result = self.client.table('pipeline_jobs').insert(row).execute()
+                    inserted += len(result.data) if result.data else 0
+                except APIError as e:
+                    if e.code != '23505':
+                        raise
+                    logger.debug(f"Segment {row['segment_id']} already has an active job")
+        
+        return inserted
+    
     def reset_stale_jobs(
         self, 
         job_type: str = 'summarize',
@@ -441,10 +817,13 @@ class SupabaseClient:
 
 
 _supabase_client: Optional[SupabaseClient] = None
+_supabase_client_lock = threading.Lock()
 
 def get_supabase_client() -> SupabaseClient:
     """Get singleton Supabase client instance."""
     global _supabase_client
     if _supabase_client is None:
-        _supabase_client = SupabaseClient()
+        with _supabase_client_lock:
+            if _supabase_client is None:
+                _supabase_client = SupabaseClient()
     return _supabase_client
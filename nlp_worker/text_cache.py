@@ -0,0 +1,104 @@
+"""Local disk cache of extracted source text, keyed by the assets' content hashes."""
+
+import os
+import tempfile
+import threading
+from typing import Any, Dict, List, Optional
+from .utils import get_logger, sha256_text, json_loads, json_dumps
+
+logger = get_logger(__name__)
+
+TEXT_CACHE_DIR = os.environ.get('TEXT_CACHE_DIR', os.path.join(tempfile.gettempdir(), 'nlp_worker_text_cache'))
+TEXT_CACHE_MAX_ENTRIES = int(os.environ.get('TEXT_CACHE_MAX_ENTRIES', '2000'))
+
+
+def text_cache_key(media_type: str, assets: List[Dict[str, Any]]) -> Optional[str]:
+    """
+    Build a cache key from the source assets' R2 keys and sha256 hashes.
+    
+    Returns:
+        Hex key, or None if any asset has no sha256 (content can't be verified)
+    """
+    if not assets or not all(asset.get('sha256') for asset in assets):
+        return None
+    parts = sorted(f"{asset['r2_key']}:{asset['sha256']}" for asset in assets)
+    return sha256_text(media_type + '\n' + '\n'.join(parts))
+
+
+class TextCache:
+    """
+    Extracted text stored as one JSON file per key.
+    
+    Keys include each asset's sha256, so a re-uploaded asset simply misses.
+    Oldest entries are removed once the directory holds more than max_entries.
+    """
+
+    def __init__(self, directory: str = TEXT_CACHE_DIR, max_entries: int = TEXT_CACHE_MAX_ENTRIES):
+        self.directory = directory
+        self.max_entries = max_entries
+        os.makedirs(directory, exist_ok=True)
+        # Counted once here and kept in memory so put() doesn't scan the directory
+        self._lock = threading.Lock()
+        self._count = self._count_entries()
+        logger.info(f"Text cache enabled at {directory} (max {max_entries} entries)")
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.directory, f"{key}.json")
+
+    def get(self, key: str) -> Optional[Dict[str, Any]]:
+        """Return the cached entry, or None on a miss or unreadable file."""
+        try:
+            with open(self._path(key), 'rb') as f:
+                return json_loads(f.read())
+        except FileNotFoundError:
+            return None
+        except (OSError, ValueError) as e:
+            logger.warning(f"Ignoring unreadable text cache entry {key}: {e}")
+            return None
+
+    def put(self, key: str, value: Dict[str, Any]) -> None:
+        """Store an entry atomically; failures are logged and ignored."""
+        path = self._path(key)
+        tmp_path = None
+        try:
+            fd, tmp_path = tempfile.mkstemp(dir=self.directory, suffix='.tmp')
+            with os.fdopen(fd, 'w', encoding='utf-8') as f:
+                f.write(json_dumps(value))
+            is_new = not os.path.exists(path)
+            os.replace(tmp_path, path)
+        except OSError as e:
+            logger.warning(f"Failed to write text cache entry {key}: {e}")
+            return
+        finally:
+            # Only still present if the write or rename failed
+            if tmp_path is not None and os.path.exists(tmp_path):
+                try:
+                    os.remove(tmp_path)
+                except OSError:
+                    pass
+
+        if not is_new:
+            return
+        with self._lock:
+            self._count += 1
+            over_limit = self._count > self.max_entries
+        if over_limit:
+            self._evict()
+
+    def _count_entries(self) -> int:
+        return sum(1 for e in os.scandir(self.directory) if e.name.endswith('.json'))
+
+    def _evict(self) -> None:
+        """Remove the least recently written entries beyond max_entries."""
+        entries = [e for e in os.scandir(self.directory) if e.name.endswith('.json')]
+        with self._lock:
+            # Rescan to pick up entries written or removed by other processes
+            self._count = min(len(entries), self.max_entries)
+        if len(entries) <= self.max_entries:
+            return
+        entries.sort(key=lambda e: e.stat().st_mtime)
+        for entry in entries[:len(entries) - self.max_entries]:
+            try:
+                os.remove(entry.path)
+            except OSError:
+                pass
@@ -2,6 +2,12 @@
 
 from .subtitle_srt import extract_subtitle_text
 from .novel_html import extract_novel_text
-from .manhwa_ocr import extract_manhwa_text
+from .manhwa_ocr import extract_manhwa_text, extract_manhwa_page, join_manhwa_pages
 
-__all__ = ['extract_subtitle_text', 'extract_novel_text', 'extract_manhwa_text']
+__all__ = [
+    'extract_subtitle_text',
+    'extract_novel_text',
+    'extract_manhwa_text',
+    'extract_manhwa_page',
+    'join_manhwa_pages',
+]
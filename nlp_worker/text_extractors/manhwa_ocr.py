@@ -1,9 +1,8 @@
 """OCR JSON text extractor for manhwa segments."""
 
-import json
 import re
-from typing import List, Dict, Any
-from ..utils import get_logger
+from typing import List, Dict, Any, Optional, Tuple, Union
+from ..utils import get_logger, json_loads
 
 logger = get_logger(__name__)
 
@@ -79,41 +78,67 @@ def extract_text_from_ocr_json(ocr_data: Dict[str, Any]) -> List[str]:
     return [line.strip() for line in lines if line and line.strip()]
 
 
-def extract_manhwa_text(ocr_assets: List[Dict[str, Any]], ocr_contents: List[str]) -> str:
+def extract_manhwa_page(asset: Dict[str, Any], content: Union[str, bytes]) -> Optional[Tuple[int, List[str]]]:
     """
-    Extract clean text from manhwa OCR JSON files.
+    Parse a single OCR JSON page.
     
     Args:
-        ocr_assets: List of asset records with r2_key
-        ocr_contents: List of raw JSON content strings (matching assets order)
+        asset: Asset record with r2_key
+        content: Raw JSON for this asset; bytes are parsed directly without decoding first
+    
+    Returns:
+        (page_number, lines), or None if the page has no text or is invalid JSON
+    """
+    r2_key = asset.get('r2_key', '')
+    
+    try:
+        lines = extract_text_from_ocr_json(json_loads(content))
+    except ValueError as e:  # JSONDecodeError, or invalid UTF-8 in bytes input
+        logger.warning(f"Failed to parse OCR JSON from {r2_key}: {e}")
+        return None
+    
+    if not lines:
+        return None
+    return extract_page_number(r2_key), lines
+
+
+def join_manhwa_pages(pages: List[Tuple[int, List[str]]]) -> str:
+    """
+    Combine parsed pages into text with page separators, in page order.
+    
+    Args:
+        pages: (page_number, lines) tuples in any order
     
     Returns:
         Combined text with page separators
     """
-    pages: List[tuple] = []
-    
-    for asset, content in zip(ocr_assets, ocr_contents):
-        r2_key = asset.get('r2_key', '')
-        page_num = extract_page_number(r2_key)
-        
-        try:
-            ocr_data = json.loads(content)
-            lines = extract_text_from_ocr_json(ocr_data)
-            
-            if lines:
-                pages.append((page_num, lines))
-        except json.JSONDecodeError as e:
-            logger.warning(f"Failed to parse OCR JSON from {r2_key}: {e}")
-            continue
-    
-    pages.sort(key=lambda x: x[0])
-    
-    result_parts = []
-    for page_num, lines in pages:
-        page_header = f"[PAGE {page_num:04d}]"
-        page_text = '\n'.join(lines)
-        result_parts.append(f"{page_header}\n{page_text}")
+    pages = sorted(pages, key=lambda x: x[0])
+    
+    result_parts = [
+        f"[PAGE {page_num:04d}]\n" + '\n'.join(lines)
+        for page_num, lines in pages
+    ]
     
     logger.info(f"Extracted text from {len(pages)} manhwa pages")
     
     return '\n\n'.join(result_parts)
+
+
+def extract_manhwa_text(ocr_assets: List[Dict[str, Any]], ocr_contents: List[Union[str, bytes]]) -> str:
+    """
+    Extract clean text from manhwa OCR JSON files.
+    
+    Args:
+        ocr_assets: List of asset records with r2_key
+        ocr_contents: List of raw JSON contents, str or bytes (matching assets order)
+    
+    Returns:
+        Combined text with page separators
+    """
+    pages = [
+        page for page in (
+            extract_manhwa_page(asset, content)
+            for asset, content in zip(ocr_assets, ocr_contents)
+        ) if page
+    ]
+    return join_manhwa_pages(pages)
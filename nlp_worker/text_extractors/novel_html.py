@@ -101,8 +101,12 @@ def extract_novel_text(html_content: str) -> str:
         Clean text with paragraphs separated by blank lines
     """
     soup = BeautifulSoup(html_content, 'html.parser')
-    
-    paragraphs = extract_paragraphs(soup)
+    try:
+        paragraphs = extract_paragraphs(soup)
+    finally:
+        # The parse tree is full of parent/sibling reference cycles; break them so
+        # its memory is returned now instead of waiting for the cyclic GC
+        soup.decompose()
     cleaned = clean_paragraphs(paragraphs)
     
     logger.info(f"Extracted {len(cleaned)} paragraphs from HTML")
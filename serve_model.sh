@@ -12,7 +12,7 @@
 #   ./serve_model.sh
 #
 # Or with custom settings:
-#   VLLM_PORT=8000 VLLM_GPU_UTIL=0.90 ./serve_model.sh
+#   VLLM_PORT=8000 VLLM_GPU_UTIL=0.90 VLLM_MAX_NUM_SEQS=64 ./serve_model.sh
 
 set -e
 
@@ -26,6 +26,8 @@ GPU_MEMORY_UTILIZATION="${VLLM_GPU_UTIL:-0.90}"
 MAX_MODEL_LEN="${VLLM_MAX_LEN:-32768}"
 DTYPE="${VLLM_DTYPE:-auto}"
 API_KEY="${VLLM_API_KEY:-token-anything}"
+# Concurrent sequences batched per step; keep >= NUM_WORKERS across all workers
+MAX_NUM_SEQS="${VLLM_MAX_NUM_SEQS:-64}"
 
 echo "=============================================="
 echo "Starting vLLM OpenAI Server"
@@ -35,6 +37,7 @@ echo "Served Name: ${SERVED_NAME}"
 echo "Host: ${HOST}:${PORT}"
 echo "GPU Memory Utilization: ${GPU_MEMORY_UTILIZATION}"
 echo "Max Model Length: ${MAX_MODEL_LEN}"
+echo "Max Concurrent Sequences: ${MAX_NUM_SEQS}"
 echo "=============================================="
 
 # Check for GPU
@@ -56,6 +59,9 @@ python3 -m vllm.entrypoints.openai.api_server \
     --gpu-memory-utilization "${GPU_MEMORY_UTILIZATION}" \
     --max-model-len "${MAX_MODEL_LEN}" \
     --dtype "${DTYPE}" \
+    --max-num-seqs "${MAX_NUM_SEQS}" \
+    --enable-chunked-prefill \
+    --enable-prefix-caching \
     --api-key "${API_KEY}" \
     --trust-remote-code
 
@@ -58,3 +58,99 @@ if isinstance(facts, list) and all(isinstance(f, str) for f in facts):
 else:
     print(f"\n❌ FAILED! Expected list of strings but got {type(facts)}")
     exit(1)
+
+# Test case: output without character_updates (non-novel media)
+print("\nTesting validation without character_updates...")
+no_chars = {k: v for k, v in test.items() if k != 'character_updates'}
+valid, normalized, err = validate_and_normalize(no_chars)
+
+if valid and normalized['character_updates'] == []:
+    print("✅ SUCCESS! Missing character_updates defaults to []")
+else:
+    print(f"❌ FAILED! valid={valid}, err={err}")
+    exit(1)
+
+# Test case: entities-only output from a partial rebuild
+print("\nTesting validation of entities-only output...")
+entities_only = {'segment_entities': test['segment_entities']}
+
+valid, normalized, err = validate_and_normalize(entities_only)
+if valid:
+    print(f"❌ FAILED! Missing summary should fail by default")
+    exit(1)
+print(f"✅ Rejected by default: {err}")
+
+valid, normalized, err = validate_and_normalize(entities_only, require_summary=False)
+if valid:
+    print("✅ SUCCESS! Accepted with require_summary=False")
+else:
+    print(f"❌ FAILED! Expected valid with require_summary=False, got: {err}")
+    exit(1)
+
+# Character merge checks against a fake DB client that records the batches
+from nlp_worker.character_merge import process_character_updates
+
+
+class FakeDB:
+    def __init__(self):
+        self.updates = []
+        self.inserts = []
+
+    def update_characters_batch(self, rows):
+        self.updates.extend(rows)
+
+    def insert_characters_batch(self, rows):
+        self.inserts.extend(rows)
+        return [dict(row, id=f"new-{i}") for i, row in enumerate(rows)]
+
+
+# Test case: a later segment re-emitting a known fact records it for that segment
+print("\nTesting a known fact re-emitted by a later segment...")
+db = FakeDB()
+work_characters = [{
+    'id': 'char-arthur',
+    'name': 'Arthur',
+    'aliases': [],
+    'character_facts': [{'fact': 'protagonist', 'segment': 1, 'source': 'segment_1'}]
+}]
+stats = process_character_updates(
+    'work-1', work_characters, [{'name': 'Arthur', 'facts': ['protagonist']}],
+    segment_number=2, model_version='test', db_client=db
+)
+segments = [f['segment'] for f in db.updates[0]['character_facts']] if db.updates else []
+
+if stats['updated'] == 1 and segments == [1, 2]:
+    print(f"✅ SUCCESS! Fact kept for segments {segments}")
+else:
+    print(f"❌ FAILED! stats={stats}, segments={segments}")
+    exit(1)
+
+# Test case: the same fact again from the same segment adds nothing new
+print("\nTesting the same fact re-emitted within its own segment...")
+db = FakeDB()
+stats = process_character_updates(
+    'work-1', work_characters, [{'name': 'Arthur', 'facts': ['protagonist']}],
+    segment_number=2, model_version='test', db_client=db
+)
+
+if stats['unchanged'] == 1 and not db.updates and len(work_characters[0]['character_facts']) == 2:
+    print("✅ SUCCESS! Repeat from the same segment skipped")
+else:
+    print(f"❌ FAILED! stats={stats}, updates={db.updates}")
+    exit(1)
+
+# Test case: a new character repeated within one segment is inserted once
+print("\nTesting a new character repeated within one segment...")
+db = FakeDB()
+stats = process_character_updates(
+    'work-1', work_characters,
+    [{'name': 'Tessia', 'facts': ['elf princess']}, {'name': 'Tessia', 'facts': ['childhood friend']}],
+    segment_number=3, model_version='test', db_client=db
+)
+facts = [f['fact'] for f in db.inserts[0]['character_facts']] if db.inserts else []
+
+if len(db.inserts) == 1 and stats['inserted'] == 1 and stats['updated'] == 0 and facts == ['elf princess', 'childhood friend']:
+    print(f"✅ SUCCESS! One insert with facts {facts}")
+else:
+    print(f"❌ FAILED! stats={stats}, inserts={db.inserts}")
+    exit(1)
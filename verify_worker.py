@@ -17,6 +17,13 @@ def main():
     else:
         print("  OK")
     
+    # R2 upload checksums use hashlib; the OpenSSL backend uses SHA-NI / ARMv8 crypto
+    import ssl
+    import hashlib
+    print(f"  {ssl.OPENSSL_VERSION}")
+    if hashlib.sha256.__name__ != 'openssl_sha256':
+        print("  WARNING: hashlib.sha256 is not OpenSSL-backed (slow SHA-256 for uploads)")
+    
     print("\n[2/6] Checking core dependencies...")
     try:
         import boto3